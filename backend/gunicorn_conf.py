@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for running the backend with multiple Uvicorn workers:
+
+    gunicorn -c gunicorn_conf.py main:app
+
+Set REDIS_URL when running more than one worker so tasks are shared between them;
+without it the server runs a single worker and refuses a WEB_CONCURRENCY above 1.
+"""
+
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker
+
+from task_store import check_worker_count, shared_store_available
+
+class MarketingAgentWorker(UvicornWorker):
+    """Uvicorn worker with the same WebSocket settings as `python main.py`."""
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "ws": "websockets",
+        "ws_max_size": 4 * 1024 * 1024,
+        "ws_ping_interval": 20,
+        "ws_ping_timeout": 20,
+        "ws_per_message_deflate": True,
+    }
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+default_workers = multiprocessing.cpu_count() * 2 + 1 if shared_store_available() else 1
+workers = check_worker_count(int(os.getenv("WEB_CONCURRENCY", default_workers)))
+worker_class = "gunicorn_conf.MarketingAgentWorker"
+keepalive = 75
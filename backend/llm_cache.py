@@ -0,0 +1,90 @@
+"""
+LLM response cache for the LangGraph Marketing Agent backend.
+Stores structured chat completions under a SHA-256 key of (model, temperature,
+schema, messages) so identical calls skip the OpenAI round-trip.
+"""
+
+import hashlib
+import json
+import os
+from typing import List, Optional, Protocol, Type, TypeVar
+
+from cachetools import TTLCache
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+# Redis is optional - the in-memory backend is used when it is not installed
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str) -> None: ...
+
+class MemoryCache:
+    """Per-process LRU cache with a time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: int = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        self._cache[key] = value
+
+class RedisCache:
+    """Cache shared by every worker through Redis."""
+
+    def __init__(self, url: str, ttl: int = 3600):
+        self._client = redis.from_url(url)
+        self._ttl = ttl
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    async def set(self, key: str, value: str) -> None:
+        await self._client.set(key, value, ex=self._ttl)
+
+def create_cache_backend() -> CacheBackend:
+    """Uses Redis when REDIS_URL is set and redis-py is installed, memory otherwise."""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url and redis is not None:
+        return RedisCache(redis_url)
+    return MemoryCache()
+
+def make_cache_key(model_name: str, temperature: float, messages: List[BaseMessage],
+                   schema: Optional[str] = None) -> str:
+    """Builds a stable cache key for a chat completion request."""
+    payload = {
+        "model": model_name,
+        "temperature": temperature,
+        "schema": schema,
+        "messages": [{"role": message.type, "content": message.content} for message in messages]
+    }
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"llm:{digest}"
+
+async def cached_structured_invoke(model, schema: Type[SchemaT], messages: List[BaseMessage],
+                                   cache: CacheBackend) -> SchemaT:
+    """
+    Returns the model's structured output as a schema instance, cached as its JSON dump.
+    Models sampling at temperature > 0 are not cached, since their answers are meant to vary.
+    """
+    if model.temperature:
+        return await model.with_structured_output(schema).ainvoke(messages)
+
+    key = make_cache_key(model.model_name, model.temperature, messages, schema.__name__)
+    cached = await cache.get(key)
+    if cached is not None:
+        return schema.model_validate_json(cached)
+
+    result = await model.with_structured_output(schema).ainvoke(messages)
+    await cache.set(key, result.model_dump_json())
+    return result
@@ -4,21 +4,29 @@ Provides REST API and WebSocket endpoints for the React frontend
 """
 
 import asyncio
-import json
+import hashlib
+import io
 import os
 import sys
-from datetime import datetime
-from typing import Dict, Any, List, TypedDict, Literal
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple, TypedDict, Literal, Union
 from typing_extensions import Annotated
 import uuid
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel, Field
+import httpx
+import msgspec
+import orjson
 import uvicorn
+from cachetools import TTLCache
 
 # LangGraph and AI imports
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -26,232 +34,317 @@ from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_openai import ChatOpenAI
 
+from llm_cache import cached_structured_invoke, create_cache_backend
+from task_store import check_worker_count, create_task_store
+
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Caps concurrent OpenAI requests per worker (multi-draft fan-out, parallel sessions)
+LLM_SEMAPHORE = asyncio.Semaphore(int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")))
+
+# Shared connection pool for OpenAI calls (keep-alive + HTTP/2 multiplexing)
+HTTP_CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+    timeout=httpx.Timeout(60.0)  # Long completions routinely exceed httpx's 5 s default
+)
+
+# (task_id, client_id) of the agent run in the current asyncio context, so nodes can
+# stream to the right WebSocket without widening AgentState. None disables streaming.
+CURRENT_TASK: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_task", default=None)
+
+# Exact-match response cache (Redis when REDIS_URL is set, in-memory otherwise)
+LLM_CACHE = create_cache_backend()
+
+# Recent finished generations, so an identical request skips the whole agent run
+GENERATION_CACHE: TTLCache = TTLCache(maxsize=1000, ttl=1800)
+
+def generation_cache_key(request: str, max_iterations: int, num_drafts: int) -> str:
+    return hashlib.blake2b(f"{request}|{max_iterations}|{num_drafts}".encode("utf-8"), digest_size=16).hexdigest()
+
+@lru_cache(maxsize=None)
+def get_chat_model(temperature: float) -> ChatOpenAI:
+    """Returns the process-wide ChatOpenAI client for the given temperature."""
+    return ChatOpenAI(
+        model="gpt-4o",
+        temperature=temperature,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        http_async_client=HTTP_CLIENT
+    )
+
 # AgentState definition
 class AgentState(TypedDict):
     initial_request: str
     research_findings: Dict[str, Any]
+    research_context: str
     draft_post: str
     critiques: List[str]
     iteration_count: int
     max_iterations: int
     human_approved: bool
+    is_human_feedback: bool
     approval_attempts: int
     messages: Annotated[List[HumanMessage], add_messages]
 
-def research_node(state: AgentState) -> AgentState:
+# Static prompt prefixes: kept byte-identical across calls so OpenAI's automatic
+# prompt caching can reuse them; per-call content goes in the final user message
+COPYWRITER_SYSTEM_PROMPT = """You are an expert marketing copywriter focused on creating engaging, conversion-optimized content.
+You will receive research findings and a marketing request. When refining, you will also receive the current draft and the feedback to address.
+
+Instructions for a new marketing post:
+1. Create a compelling hook in the first line
+2. Include 2-3 key value propositions
+3. Use conversational yet professional tone
+4. Include a clear call-to-action
+5. Integrate 3-5 relevant hashtags naturally
+6. Keep it concise (under 300 words for social media)
+7. Make it platform-appropriate (professional for LinkedIn, engaging for Instagram)
+
+Instructions when refining a marketing post:
+Revise the post to address all the feedback while maintaining its strengths.
+Ensure the refined version:
+1. Addresses each specific point mentioned in the feedback (especially human feedback)
+2. Maintains the overall marketing effectiveness
+3. Stays true to the original request
+4. Follows best practices for the target platforms"""
+
+CRITIC_SYSTEM_PROMPT = """You are an expert marketing critic with years of experience in social media marketing, content strategy, and conversion optimization. Your job is to provide constructive, specific critiques of marketing content.
+
+Please evaluate the marketing post you receive and provide specific, actionable critiques.
+Focus on these key areas:
+
+1. **Hook & Engagement**: Does it grab attention in the first line?
+2. **Value Proposition**: Are the benefits clear and compelling?
+3. **Target Audience**: Is the tone and content appropriate for the target demographic?
+4. **Call-to-Action**: Is there a clear, compelling CTA?
+5. **Platform Optimization**: Is it optimized for the intended social platforms?
+6. **Length & Readability**: Is it the right length and easy to read?
+7. **Hashtag Usage**: Are hashtags relevant and not excessive?
+8. **Original Request Alignment**: Does it fulfill the original request?
+
+IMPORTANT INSTRUCTIONS:
+- If the post is already excellent and meets all criteria, set "ready" to true and leave "items" empty
+- If there are issues, set "ready" to false and provide 1-3 specific, actionable critiques in "items"
+- Each critique should be clear, specific, and explain WHY it needs improvement
+- Focus on the most important issues first
+- Be constructive, not just critical"""
+
+# Per-call prompt templates, filled with str.format_map
+RESEARCH_CONTEXT_TEMPLATE = """Research Findings:
+
+Key Points:
+{key_points}
+
+Competitor Insights:
+{competitor_insights}
+
+Trending Hashtags: {hashtags}
+
+Target Audience: {age_range} year-olds interested in {interests}
+
+Primary Platforms: {platforms}
+
+Success Criteria:
+{success_criteria}"""
+
+COPYWRITER_INITIAL_TEMPLATE = """{research_context}
+
+Create an engaging marketing post for the following request: "{initial_request}"
+
+Generate the marketing post now:"""
+
+COPYWRITER_REFINE_TEMPLATE = """{research_context}
+
+ORIGINAL REQUEST: "{initial_request}"
+
+CURRENT DRAFT:
+{current_draft}
+
+{feedback_type} TO ADDRESS:
+{critiques}
+
+IMPORTANT: {feedback_note}
+
+Generate the refined marketing post:"""
+
+CRITIC_TEMPLATE = """{research_context}
+
+ORIGINAL REQUEST: "{initial_request}"
+
+DRAFT MARKETING POST TO CRITIQUE:
+{draft_post}"""
+
+HUMAN_FEEDBACK_NOTE = "This is direct feedback from a human reviewer. Please follow their specific instructions carefully and prioritize their requirements above all else."
+AI_CRITIQUES_NOTE = "These are AI-generated critiques for improvement."
+
+# Shared, immutable system messages - built once instead of per node call
+COPYWRITER_SYSTEM_MESSAGE = SystemMessage(content=COPYWRITER_SYSTEM_PROMPT)
+CRITIC_SYSTEM_MESSAGE = SystemMessage(content=CRITIC_SYSTEM_PROMPT)
+
+class Critique(BaseModel):
+    """Structured critic verdict, returned by the model via function calling."""
+    ready: bool = Field(description="True when the post needs no further changes")
+    items: List[str] = Field(default_factory=list, description="1-3 specific, actionable critiques")
+
+def render_research_context(research: Dict[str, Any]) -> str:
+    """Renders the research findings shared by every copywriter and critic prompt."""
+    demographics = research['audience_demographics']
+    return RESEARCH_CONTEXT_TEMPLATE.format_map({
+        "key_points": "\n".join("• " + point for point in research['key_points']),
+        "competitor_insights": "\n".join("• " + insight for insight in research['competitor_insights']),
+        "hashtags": ", ".join(research['trending_hashtags']),
+        "age_range": demographics['age_range'],
+        "interests": ", ".join(demographics['interests']),
+        "platforms": ", ".join(demographics['platforms']),
+        "success_criteria": "\n".join("• " + criterion for criterion in research['success_criteria'])
+    })
+
+# Mock research payload shared by every request; only the topic differs
+_MOCK_RESEARCH_TEMPLATE = {
+    "key_points": (
+        "Current market trends show high engagement with authentic content",
+        "Target audience prefers concise, value-driven messaging",
+        "Visual elements increase engagement by 40%",
+        "Best posting times are typically 9-11 AM and 2-4 PM"
+    ),
+    "competitor_insights": (
+        "Top competitors focus on storytelling approaches",
+        "User-generated content performs 50% better",
+        "Behind-the-scenes content drives authenticity"
+    ),
+    "trending_hashtags": (
+        "#marketing2024", "#digitalstrategy", "#contenttips", 
+        "#socialmedia", "#brandstory"
+    ),
+    "audience_demographics": {
+        "age_range": "25-45",
+        "interests": ("business", "entrepreneurship", "digital marketing"),
+        "platforms": ("LinkedIn", "Instagram", "Twitter")
+    },
+    "success_criteria": (
+        "Clear value proposition",
+        "Engaging hook",
+        "Strong call-to-action",
+        "Appropriate tone for target audience",
+        "Optimal length for platform"
+    )
+}
+
+# The rendered context does not depend on the topic, so it is built once
+_MOCK_RESEARCH_CONTEXT = render_research_context(_MOCK_RESEARCH_TEMPLATE)
+
+def research_node(state: AgentState) -> Dict[str, Any]:
     """Research node that simulates researching a topic."""
-    initial_request = state["initial_request"]
-    
-    mock_research = {
-        "topic": initial_request,
-        "key_points": [
-            "Current market trends show high engagement with authentic content",
-            "Target audience prefers concise, value-driven messaging",
-            "Visual elements increase engagement by 40%",
-            "Best posting times are typically 9-11 AM and 2-4 PM"
-        ],
-        "competitor_insights": [
-            "Top competitors focus on storytelling approaches",
-            "User-generated content performs 50% better",
-            "Behind-the-scenes content drives authenticity"
-        ],
-        "trending_hashtags": [
-            "#marketing2024", "#digitalstrategy", "#contenttips", 
-            "#socialmedia", "#brandstory"
-        ],
-        "audience_demographics": {
-            "age_range": "25-45",
-            "interests": ["business", "entrepreneurship", "digital marketing"],
-            "platforms": ["LinkedIn", "Instagram", "Twitter"]
-        },
-        "success_criteria": [
-            "Clear value proposition",
-            "Engaging hook",
-            "Strong call-to-action",
-            "Appropriate tone for target audience",
-            "Optimal length for platform"
-        ]
-    }
+    mock_research = {"topic": state["initial_request"], **_MOCK_RESEARCH_TEMPLATE}
     
+    # Nodes return only the keys they change; LangGraph (and the async runner) merge them into the state
     return {
-        **state,
-        "research_findings": mock_research
+        "research_findings": mock_research,
+        "research_context": _MOCK_RESEARCH_CONTEXT
     }
 
-def copywriting_node(state: AgentState) -> AgentState:
+async def copywriting_node(state: AgentState) -> Dict[str, Any]:
     """Copywriting node that creates or refines a marketing post."""
-    research = state["research_findings"]
     initial_request = state["initial_request"]
     critiques = state.get("critiques", [])
     iteration_count = state.get("iteration_count", 0)
     
-    model = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.7,
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    model = get_chat_model(0.7)
     
-    if iteration_count == 0:
-        copywriter_prompt = f"""
-        You are an expert marketing copywriter. Based on the research provided below, 
-        create an engaging marketing post for the following request: "{initial_request}"
-        
-        Research Findings:
-        
-        Key Points:
-        {chr(10).join('• ' + point for point in research['key_points'])}
-        
-        Competitor Insights:
-        {chr(10).join('• ' + insight for insight in research['competitor_insights'])}
-        
-        Trending Hashtags: {', '.join(research['trending_hashtags'])}
-        
-        Target Audience: {research['audience_demographics']['age_range']} year-olds interested in {', '.join(research['audience_demographics']['interests'])}
-        
-        Primary Platforms: {', '.join(research['audience_demographics']['platforms'])}
-        
-        Success Criteria:
-        {chr(10).join('• ' + criterion for criterion in research['success_criteria'])}
-        
-        Instructions for the marketing post:
-        1. Create a compelling hook in the first line
-        2. Include 2-3 key value propositions
-        3. Use conversational yet professional tone
-        4. Include a clear call-to-action
-        5. Integrate 3-5 relevant hashtags naturally
-        6. Keep it concise (under 300 words for social media)
-        7. Make it platform-appropriate (professional for LinkedIn, engaging for Instagram)
-        
-        Generate the marketing post now:
-        """
+    # Set where the feedback is injected, so no need to scan the critiques for it
+    has_human_feedback = state.get("is_human_feedback", False)
+    
+    if iteration_count == 0 and not has_human_feedback:
+        copywriter_prompt = COPYWRITER_INITIAL_TEMPLATE.format_map({
+            "research_context": state["research_context"],
+            "initial_request": initial_request
+        })
     else:
-        current_draft = state["draft_post"]
-        has_human_feedback = any("Human feedback:" in critique for critique in critiques)
-        feedback_type = "HUMAN FEEDBACK" if has_human_feedback else "AI CRITIQUES"
-        
-        copywriter_prompt = f"""
-        You are an expert marketing copywriter refining a marketing post. 
-        
-        ORIGINAL REQUEST: "{initial_request}"
-        
-        CURRENT DRAFT:
-        {current_draft}
-        
-        {feedback_type} TO ADDRESS:
-        {chr(10).join('• ' + critique for critique in critiques)}
-        
-        RESEARCH CONTEXT:
-        Key Points: {', '.join(research['key_points'])}
-        Success Criteria: {', '.join(research['success_criteria'])}
-        Target Audience: {research['audience_demographics']['age_range']} year-olds on {', '.join(research['audience_demographics']['platforms'])}
-        
-        IMPORTANT: {"This is direct feedback from a human reviewer. Please follow their specific instructions carefully and prioritize their requirements above all else." if has_human_feedback else "These are AI-generated critiques for improvement."}
-        
-        Please revise the marketing post to address all the feedback while maintaining its strengths. 
-        Ensure the refined version:
-        1. Addresses each specific point mentioned above {"(especially the human feedback)" if has_human_feedback else ""}
-        2. Maintains the overall marketing effectiveness
-        3. Stays true to the original request
-        4. Follows best practices for the target platforms
-        
-        Generate the refined marketing post:
-        """
+        copywriter_prompt = COPYWRITER_REFINE_TEMPLATE.format_map({
+            "research_context": state["research_context"],
+            "initial_request": initial_request,
+            "current_draft": state["draft_post"],
+            "feedback_type": "HUMAN FEEDBACK" if has_human_feedback else "AI CRITIQUES",
+            "critiques": "\n".join("• " + critique for critique in critiques),
+            "feedback_note": HUMAN_FEEDBACK_NOTE if has_human_feedback else AI_CRITIQUES_NOTE
+        })
     
     messages = [
-        SystemMessage(content="You are a skilled marketing copywriter focused on creating engaging, conversion-optimized content."),
+        COPYWRITER_SYSTEM_MESSAGE,
         HumanMessage(content=copywriter_prompt)
     ]
     
-    response = model.invoke(messages)
-    draft_post = response.content
+    # Stream tokens to the client as they arrive instead of waiting for the full completion
+    current_task = CURRENT_TASK.get()
+    chunks = []
+    async with LLM_SEMAPHORE:
+        async for chunk in model.astream(messages):
+            chunks.append(chunk.content)
+            if current_task is not None and chunk.content:
+                task_id, client_id = current_task
+                await manager.send_json_message({
+                    "type": "draft_token",
+                    "task_id": task_id,
+                    "delta": chunk.content
+                }, client_id)
+    draft_post = "".join(chunks)
     
     return {
-        **state,
         "draft_post": draft_post,
-        "iteration_count": iteration_count + 1
+        "iteration_count": iteration_count + 1,
+        "is_human_feedback": False
     }
 
-def critic_node(state: AgentState) -> AgentState:
+async def critic_node(state: AgentState) -> Dict[str, Any]:
     """Critic node that analyzes the draft post and provides improvement suggestions."""
     draft_post = state["draft_post"]
     initial_request = state["initial_request"]
-    research = state["research_findings"]
     
-    model = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.3,
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    # Temperature 0: the verdict is a classification, and a deterministic critic is what
+    # makes reusing a cached verdict for an unchanged draft correct
+    model = get_chat_model(0.0)
     
-    critic_prompt = f"""
-    You are an expert marketing critic with years of experience in social media marketing, 
-    content strategy, and conversion optimization. Your job is to provide constructive, 
-    specific critiques of marketing content.
-    
-    ORIGINAL REQUEST: "{initial_request}"
-    
-    DRAFT MARKETING POST TO CRITIQUE:
-    {draft_post}
-    
-    RESEARCH CONTEXT:
-    Success Criteria: {', '.join(research['success_criteria'])}
-    Key Points: {', '.join(research['key_points'])}
-    Target Audience: {research['audience_demographics']['age_range']} year-olds interested in {', '.join(research['audience_demographics']['interests'])}
-    Primary Platforms: {', '.join(research['audience_demographics']['platforms'])}
-    Competitor Insights: {', '.join(research['competitor_insights'])}
-    
-    Please evaluate this marketing post and provide specific, actionable critiques. 
-    Focus on these key areas:
-    
-    1. **Hook & Engagement**: Does it grab attention in the first line?
-    2. **Value Proposition**: Are the benefits clear and compelling?
-    3. **Target Audience**: Is the tone and content appropriate for the target demographic?
-    4. **Call-to-Action**: Is there a clear, compelling CTA?
-    5. **Platform Optimization**: Is it optimized for the intended social platforms?
-    6. **Length & Readability**: Is it the right length and easy to read?
-    7. **Hashtag Usage**: Are hashtags relevant and not excessive?
-    8. **Original Request Alignment**: Does it fulfill the original request?
-    
-    IMPORTANT INSTRUCTIONS:
-    - If the post is already excellent and meets all criteria, respond with exactly: "No critiques - the post is ready."
-    - If there are issues, provide 1-3 specific, actionable critiques
-    - Each critique should be clear, specific, and explain WHY it needs improvement
-    - Focus on the most important issues first
-    - Be constructive, not just critical
-    
-    Your response should be either "No critiques - the post is ready." OR a numbered list of specific critiques:
-    """
+    critic_prompt = CRITIC_TEMPLATE.format_map({
+        "research_context": state["research_context"],
+        "initial_request": initial_request,
+        "draft_post": draft_post
+    })
     
     messages = [
-        SystemMessage(content="You are a marketing expert providing constructive critique to improve content quality."),
+        CRITIC_SYSTEM_MESSAGE,
         HumanMessage(content=critic_prompt)
     ]
     
-    response = model.invoke(messages)
-    critique_response = response.content.strip()
-    
-    if "No critiques - the post is ready." in critique_response.lower():
-        critiques = []
-    else:
-        critique_lines = [line.strip() for line in critique_response.split('\n') if line.strip()]
-        critiques = []
-        
-        for line in critique_lines:
-            if any(line.startswith(prefix) for prefix in ['1.', '2.', '3.', '•', '-', '*']):
-                critiques.append(line)
-        
-        if not critiques and critique_response:
-            critiques = [critique_response]
+    # Critiques of an unchanged draft are reused instead of re-paying the LLM call
+    async with LLM_SEMAPHORE:
+        verdict = await cached_structured_invoke(model, Critique, messages, LLM_CACHE)
+    critiques = [] if verdict.ready else [item.strip() for item in verdict.items if item.strip()]
     
     return {
-        **state,
         "critiques": critiques
     }
 
+async def critique_drafts(drafts: List[AgentState]) -> List[Dict[str, Any]]:
+    """Critiques several draft variants concurrently."""
+    return list(await asyncio.gather(*(critic_node(draft) for draft in drafts)))
+
+async def _write_candidate_draft(state: AgentState) -> Dict[str, Any]:
+    # Runs in its own task context: interleaved candidates must not stream to the client
+    CURRENT_TASK.set(None)
+    return await copywriting_node(state)
+
+async def generate_best_draft(state: AgentState, num_drafts: int) -> Dict[str, Any]:
+    """
+    Generates num_drafts candidate posts concurrently and returns the state updates
+    (draft and critiques) of the one with the fewest critiques.
+    """
+    drafts = await asyncio.gather(*(_write_candidate_draft(state) for _ in range(num_drafts)))
+    reviews = await critique_drafts([{**state, **draft} for draft in drafts])
+    best = min(range(num_drafts), key=lambda index: len(reviews[index]["critiques"]))
+    return {**drafts[best], **reviews[best]}
+
 def human_approval_node(state: AgentState) -> AgentState:
     """
     Human approval node that requests human review and approval of the draft post.
@@ -261,33 +354,18 @@ def human_approval_node(state: AgentState) -> AgentState:
 
 def should_continue(state: AgentState) -> Literal["human_approval", "copywriting", "END"]:
     """Conditional edge function that determines the next step in the workflow."""
-    critiques = state.get("critiques", [])
-    iteration_count = state.get("iteration_count", 0)
-    max_iterations = state.get("max_iterations", 3)
-    human_approved = state.get("human_approved", False)
-    
     # If human has already approved, end the process
-    if human_approved:
+    if state.get("human_approved"):
         return "END"
     
-    # If no critiques from critic_node, proceed to human approval
-    if not critiques and iteration_count > 0:
-        return "human_approval"
-    
-    # If there are critiques and we haven't reached max iterations, continue refining
-    elif critiques and iteration_count < max_iterations:
+    # Keep refining while there are critiques and iterations left, otherwise go to human review
+    if state.get("critiques") and state.get("iteration_count", 0) < state.get("max_iterations", 3):
         return "copywriting"
-    
-    # If we've reached max iterations, still go to human approval for final decision
-    elif iteration_count >= max_iterations:
-        return "human_approval"
-    
-    # Default fallback
-    else:
-        return "human_approval"
+    return "human_approval"
 
+@lru_cache(maxsize=None)
 def create_marketing_agent():
-    """Creates and compiles the marketing agent StateGraph."""
+    """Creates and compiles the marketing agent StateGraph (built once per process and reused)."""
     workflow = StateGraph(AgentState)
     
     workflow.add_node("research", research_node)
@@ -323,7 +401,12 @@ def create_marketing_agent():
     app = workflow.compile()
     return app
 
-def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str:
+def write_report_file(filepath: str, markdown_content: str) -> None:
+    """Writes the rendered report to disk (blocking, run it in a worker thread)."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(markdown_content)
+
+async def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str:
     """Generates a comprehensive markdown report of the marketing agent process and results."""
     if filename is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -340,59 +423,54 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
     human_approved = state.get("human_approved", False)
     approval_attempts = state.get("approval_attempts", 0)
     
-    markdown_content = f"""# Marketing Agent Report
-
-## 📋 Executive Summary
-
-**Generated on**: {datetime.now().strftime("%B %d, %Y at %I:%M %p")}
-**Initial Request**: {initial_request}
-**Process Status**: {"✅ Approved" if human_approved else "⏸️ Incomplete"}
-**Total Refinement Iterations**: {iteration_count}
-**Human Approval Attempts**: {approval_attempts}
-
----
-
-## ✍️ Final Marketing Post
-
-```
-{draft_post if draft_post else "No content generated"}
-```
-
-### Content Statistics
-- **Character Count**: {len(draft_post)}
-- **Word Count**: {len(draft_post.split())}
-
----
-
-## 🔬 Research Findings
-
-### Key Insights
-{chr(10).join('- ' + point for point in research.get('key_points', ['No key points available']))}
-
-### Target Audience Profile
-- **Age Range**: {research.get('audience_demographics', {}).get('age_range', 'Not specified')}
-- **Primary Platforms**: {', '.join(research.get('audience_demographics', {}).get('platforms', ['Not specified']))}
-- **Interests**: {', '.join(research.get('audience_demographics', {}).get('interests', ['Not specified']))}
-
-### Outstanding Critiques
-{chr(10).join('- ' + critique for critique in critiques) if critiques else "No outstanding critiques"}
-
----
-
-## 👤 Human Review Process
-
-### Approval Status
-**Status**: {"✅ Approved by human reviewer" if human_approved else "❌ Pending human approval"}
-**Review Attempts**: {approval_attempts}
-
----
-
-**Generated by**: LangGraph Marketing Agent Web Version
-"""
+    demographics = research.get('audience_demographics', {})
+    
+    # Fragments go into one growing buffer instead of a chain of temporary strings
+    buf = io.StringIO()
+    w = buf.write
+    
+    w("# Marketing Agent Report\n\n## 📋 Executive Summary\n\n")
+    w(f"**Generated on**: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n")
+    w(f"**Initial Request**: {initial_request}\n")
+    w(f"**Process Status**: {'✅ Approved' if human_approved else '⏸️ Incomplete'}\n")
+    w(f"**Total Refinement Iterations**: {iteration_count}\n")
+    w(f"**Human Approval Attempts**: {approval_attempts}\n\n---\n\n")
+    
+    w("## ✍️ Final Marketing Post\n\n```\n")
+    w(draft_post if draft_post else "No content generated")
+    w("\n```\n\n### Content Statistics\n")
+    w(f"- **Character Count**: {len(draft_post)}\n")
+    w(f"- **Word Count**: {len(draft_post.split())}\n\n---\n\n")
+    
+    w("## 🔬 Research Findings\n\n### Key Insights\n")
+    key_points = research.get('key_points', ['No key points available'])
+    for index, point in enumerate(key_points):
+        w("\n- " if index else "- ")
+        w(point)
+    
+    w("\n\n### Target Audience Profile\n")
+    w(f"- **Age Range**: {demographics.get('age_range', 'Not specified')}\n")
+    w(f"- **Primary Platforms**: {', '.join(demographics.get('platforms', ['Not specified']))}\n")
+    w(f"- **Interests**: {', '.join(demographics.get('interests', ['Not specified']))}\n\n")
+    
+    w("### Outstanding Critiques\n")
+    if critiques:
+        for index, critique in enumerate(critiques):
+            w("\n- " if index else "- ")
+            w(critique)
+    else:
+        w("No outstanding critiques")
+    
+    w("\n\n---\n\n## 👤 Human Review Process\n\n### Approval Status\n")
+    w(f"**Status**: {'✅ Approved by human reviewer' if human_approved else '❌ Pending human approval'}\n")
+    w(f"**Review Attempts**: {approval_attempts}\n\n---\n\n")
+    w("**Generated by**: LangGraph Marketing Agent Web Version\n")
+    
+    markdown_content = buf.getvalue()
 
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(markdown_content)
+        # Disk I/O runs off the event loop so WebSocket traffic is never stalled
+        await asyncio.to_thread(write_report_file, filepath, markdown_content)
         return filepath
     except Exception as e:
         print(f"❌ Error generating markdown report: {e}")
@@ -402,6 +480,8 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 class MarketingRequest(BaseModel):
     request: str
     max_iterations: int = 3
+    num_drafts: int = Field(1, ge=1, le=5)  # >1 enables concurrent multi-draft generation
+    no_cache: bool = False  # Always generate a fresh post, even for a recently seen request
 
 class MarketingResponse(BaseModel):
     success: bool
@@ -420,24 +500,65 @@ class HumanFeedback(BaseModel):
     action: str  # "approve", "reject", "feedback"
     feedback: str = ""  # Optional feedback text
 
-# Global state management
-active_tasks = {}
-websocket_connections = {}
+# Inbound WebSocket messages, decoded and validated by msgspec in a single pass
+class FeedbackPayload(msgspec.Struct):
+    action: Literal["approve", "reject", "feedback"]
+    feedback: str = ""
+
+class StartGenerationMessage(msgspec.Struct, tag="start_generation", tag_field="type"):
+    task_id: str
+    no_cache: bool = False
+
+class HumanFeedbackMessage(msgspec.Struct, tag="human_feedback", tag_field="type"):
+    task_id: str
+    feedback: FeedbackPayload
+
+class PingMessage(msgspec.Struct, tag="ping", tag_field="type"):
+    pass
+
+InboundMessage = Union[StartGenerationMessage, HumanFeedbackMessage, PingMessage]
+INBOUND_DECODER = msgspec.json.Decoder(InboundMessage)
+# Binary protocol for clients connecting with ?encoding=msgpack
+MSGPACK_DECODER = msgspec.msgpack.Decoder(InboundMessage)
+MSGPACK_ENCODER = msgspec.msgpack.Encoder()
+
+# Global state management (Redis-backed when REDIS_URL is set, so workers share tasks)
+task_store = create_task_store()
+
+async def prewarm_openai_connection():
+    """Opens a pooled connection to the OpenAI API with a one-token completion."""
+    try:
+        await get_chat_model(0.0).ainvoke([HumanMessage(content="hi")], max_tokens=1)
+        print("🔥 OpenAI connection pool warmed up")
+    except Exception as e:
+        print(f"⚠️ OpenAI warm-up failed: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 LangGraph Marketing Agent API starting...")
+    # Pay graph compilation and client setup now rather than on the first request
+    create_marketing_agent()
+    get_chat_model(0.7)
+    get_chat_model(0.0)
+    if os.getenv("OPENAI_PREWARM"):
+        await prewarm_openai_connection()
+    workers = [asyncio.create_task(agent_worker()) for _ in range(AGENT_WORKERS)]
     yield
     # Shutdown
     print("🛑 LangGraph Marketing Agent API shutting down...")
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await HTTP_CLIENT.aclose()
 
 # Create FastAPI app
 app = FastAPI(
     title="LangGraph Marketing Agent API",
     description="REST API and WebSocket interface for the LangGraph Marketing Agent with critique & refine loop and human approval",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # Same encoder as the WebSocket frames
 )
 
 # Add CORS middleware
@@ -449,108 +570,221 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (task state, research findings, frontend bundle)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# React build output, resolved once at import
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+INDEX_FILE = os.path.join(STATIC_DIR, "index.html")
+INDEX_HEADERS = {"Cache-Control": "no-cache"}
+# Top-level build files (favicon, manifest, ...) served by the catch-all route without a per-request stat
+ROOT_FILES = {
+    entry.name: entry.path for entry in os.scandir(STATIC_DIR) if entry.is_file()
+} if os.path.isdir(STATIC_DIR) else {}
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for content-hashed build assets, which browsers may cache forever."""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 # Mount static files for React frontend
-static_dir = os.path.join(os.path.dirname(__file__), "static")
-if os.path.exists(static_dir):
+if os.path.exists(STATIC_DIR):
     # Mount the React static files (CSS, JS, etc.)
-    react_static_dir = os.path.join(static_dir, "static")
+    react_static_dir = os.path.join(STATIC_DIR, "static")
     if os.path.exists(react_static_dir):
-        app.mount("/static", StaticFiles(directory=react_static_dir), name="react_static")
+        app.mount("/static", ImmutableStaticFiles(directory=react_static_dir), name="react_static")
     
     # Also mount the root static directory for other files (favicon, manifest, etc.)
-    app.mount("/assets", StaticFiles(directory=static_dir), name="assets")
+    app.mount("/assets", StaticFiles(directory=STATIC_DIR), name="assets")
 
 class WebSocketManager:
+    """
+    Tracks client sockets. Each client has a bounded outbound queue drained by a
+    single writer task, so producers (the agent pipeline) never wait on slow sockets.
+    Clients speak JSON text frames by default, or msgpack binary frames if they opt in.
+    """
+    SEND_QUEUE_SIZE = 128
+    FLUSH_INTERVAL = 0.01  # Seconds to gather a burst of updates before writing
+    # Sent without waiting for the flush window: the user is waiting on these
+    IMMEDIATE_TYPES = frozenset({"awaiting_human_approval", "generation_complete", "generation_error", "error", "pong"})
+
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.senders: Dict[str, asyncio.Task] = {}
+        self.msgpack_clients: set = set()
 
-    async def connect(self, websocket: WebSocket, client_id: str):
+    async def connect(self, websocket: WebSocket, client_id: str, use_msgpack: bool = False):
         await websocket.accept()
         self.active_connections[client_id] = websocket
+        if use_msgpack:
+            self.msgpack_clients.add(client_id)
+        self.queues[client_id] = asyncio.Queue(maxsize=self.SEND_QUEUE_SIZE)
+        self.senders[client_id] = asyncio.create_task(self._sender_loop(client_id))
         await self.send_personal_message("Connected to LangGraph Marketing Agent", client_id)
 
     def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
+        self.active_connections.pop(client_id, None)
+        self.queues.pop(client_id, None)
+        self.msgpack_clients.discard(client_id)
+        sender = self.senders.pop(client_id, None)
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+
+    async def receive_message(self, websocket: WebSocket, client_id: str) -> InboundMessage:
+        """
+        Reads the next client frame (text or binary) and decodes it into a typed message.
+        Raises msgspec.DecodeError for malformed or unknown messages.
+        """
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000))
+        raw = frame.get("bytes")
+        if raw is None:
+            return INBOUND_DECODER.decode(frame["text"])
+        if client_id in self.msgpack_clients:
+            return MSGPACK_DECODER.decode(raw)
+        return INBOUND_DECODER.decode(raw)
+
+    def _enqueue(self, message: Any, client_id: str):
+        queue = self.queues.get(client_id)
+        if queue is None:
+            return
+        if queue.full():
+            queue.get_nowait()  # Drop the oldest message rather than block the pipeline
+        queue.put_nowait(message)
 
     async def send_personal_message(self, message: str, client_id: str):
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(message)
-            except:
-                self.disconnect(client_id)
+        self._enqueue(message, client_id)
 
     async def send_json_message(self, data: dict, client_id: str):
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(json.dumps(data))
-            except:
-                self.disconnect(client_id)
+        self._enqueue(data, client_id)
+
+    @staticmethod
+    def _coalesce(messages: List[Any]) -> List[Any]:
+        """Keeps only the latest of consecutive status updates and joins consecutive draft tokens."""
+        merged = []
+        for message in messages:
+            previous = merged[-1] if merged else None
+            if isinstance(message, dict) and isinstance(previous, dict) and message.get("type") == previous.get("type"):
+                if message["type"] == "status":
+                    merged[-1] = message
+                    continue
+                if message["type"] == "draft_token" and message.get("task_id") == previous.get("task_id"):
+                    merged[-1] = {**previous, "delta": previous["delta"] + message["delta"]}
+                    continue
+            merged.append(message)
+        return merged
+
+    async def _sender_loop(self, client_id: str):
+        websocket = self.active_connections[client_id]
+        queue = self.queues[client_id]
+        use_msgpack = client_id in self.msgpack_clients
+        try:
+            while True:
+                pending = [await queue.get()]
+                first = pending[0]
+                if isinstance(first, dict) and first.get("type") not in self.IMMEDIATE_TYPES:
+                    # Let a burst of status updates / tokens accumulate so they coalesce into fewer frames
+                    await asyncio.sleep(self.FLUSH_INTERVAL)
+                while not queue.empty():
+                    pending.append(queue.get_nowait())
+                
+                for message in self._coalesce(pending):
+                    if use_msgpack:
+                        await websocket.send_bytes(MSGPACK_ENCODER.encode(message))
+                    elif isinstance(message, str):
+                        await websocket.send_text(message)
+                    else:
+                        # Text frames keep the protocol the React client parses with JSON.parse
+                        await websocket.send_text(orjson.dumps(message).decode("utf-8"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(client_id)
 
 manager = WebSocketManager()
 
-async def run_marketing_agent_async(request: str, max_iterations: int, client_id: str) -> Dict[str, Any]:
+async def prepare_agent_state(request: str, max_iterations: int, client_id: str) -> AgentState:
+    """Builds the initial agent state and runs the research phase, reporting progress via WebSocket."""
+    # Send initial status
+    await manager.send_json_message({
+        "type": "status",
+        "status": "starting",
+        "progress": 0,
+        "current_step": "Initializing agent",
+        "message": f"Starting marketing agent for: '{request}'"
+    }, client_id)
+
+    # Create the agent
+    await manager.send_json_message({
+        "type": "status",
+        "status": "running",
+        "progress": 10,
+        "current_step": "Creating agent",
+        "message": "Setting up LangGraph marketing agent..."
+    }, client_id)
+    
+    agent = create_marketing_agent()
+    
+    # Initialize state
+    await manager.send_json_message({
+        "type": "status",
+        "status": "running",
+        "progress": 20,
+        "current_step": "Starting research",
+        "message": "Initializing agent state and beginning research phase..."
+    }, client_id)
+    
+    initial_state = {
+        "initial_request": request,
+        "research_findings": {},
+        "research_context": "",
+        "draft_post": "",
+        "critiques": [],
+        "iteration_count": 0,
+        "max_iterations": max_iterations,
+        "human_approved": False,
+        "is_human_feedback": False,
+        "approval_attempts": 0,
+        "messages": []
+    }
+    
+    # Research phase
+    await manager.send_json_message({
+        "type": "status",
+        "status": "running",
+        "progress": 30,
+        "current_step": "Researching topic",
+        "message": "🔍 Conducting market research and analysis..."
+    }, client_id)
+    
+    state = initial_state
+    state.update(research_node(state))
+    
+    await manager.send_json_message({
+        "type": "research_complete",
+        "research_findings": state["research_findings"],
+        "message": f"📊 Research completed - found {len(state['research_findings']['key_points'])} key insights"
+    }, client_id)
+    
+    return state
+
+async def run_marketing_agent_async(request: str, max_iterations: int, client_id: str, num_drafts: int = 1,
+                                    resume_state: AgentState = None) -> Dict[str, Any]:
     """
-    Async version of the marketing agent that sends real-time updates via WebSocket
+    Async version of the marketing agent that sends real-time updates via WebSocket.
+    Pass resume_state to continue refining an existing draft after human feedback.
     """
     try:
-        # Send initial status
-        await manager.send_json_message({
-            "type": "status",
-            "status": "starting",
-            "progress": 0,
-            "current_step": "Initializing agent",
-            "message": f"Starting marketing agent for: '{request}'"
-        }, client_id)
-
-        # Create the agent
-        await manager.send_json_message({
-            "type": "status",
-            "status": "running",
-            "progress": 10,
-            "current_step": "Creating agent",
-            "message": "Setting up LangGraph marketing agent..."
-        }, client_id)
-        
-        agent = create_marketing_agent()
-        
-        # Initialize state
-        await manager.send_json_message({
-            "type": "status",
-            "status": "running",
-            "progress": 20,
-            "current_step": "Starting research",
-            "message": "Initializing agent state and beginning research phase..."
-        }, client_id)
-        
-        initial_state = {
-            "initial_request": request,
-            "research_findings": {},
-            "draft_post": "",
-            "critiques": [],
-            "iteration_count": 0,
-            "max_iterations": max_iterations,
-            "human_approved": False,
-            "approval_attempts": 0,
-            "messages": []
-        }
-        
-        # Research phase
-        await manager.send_json_message({
-            "type": "status",
-            "status": "running",
-            "progress": 30,
-            "current_step": "Researching topic",
-            "message": "🔍 Conducting market research and analysis..."
-        }, client_id)
-        
-        state = research_node(initial_state)
-        
-        await manager.send_json_message({
-            "type": "research_complete",
-            "research_findings": state["research_findings"],
-            "message": f"📊 Research completed - found {len(state['research_findings']['key_points'])} key insights"
-        }, client_id)
+        if resume_state is not None:
+            state = resume_state
+        else:
+            state = await prepare_agent_state(request, max_iterations, client_id)
         
         # Main agent loop - continue until human approval or completion
         while not state.get("human_approved", False):
@@ -564,25 +798,36 @@ async def run_marketing_agent_async(request: str, max_iterations: int, client_id
                 "message": "✍️ Generating/refining marketing post..."
             }, client_id)
             
-            state = copywriting_node(state)
-            
-            await manager.send_json_message({
-                "type": "draft_created",
-                "draft_post": state["draft_post"],
-                "iteration": state["iteration_count"],
-                "message": f"📝 Draft {'created' if state['iteration_count'] == 1 else 'refined'} ({len(state['draft_post'])} characters)"
-            }, client_id)
-            
-            # Critic phase
-            await manager.send_json_message({
-                "type": "status",
-                "status": "running",
-                "progress": min(progress_base + 5, 90),
-                "current_step": f"Analyzing draft (iteration {state['iteration_count']})",
-                "message": "🔍 Analyzing draft for improvements..."
-            }, client_id)
-            
-            state = critic_node(state)
+            if num_drafts > 1 and state.get("iteration_count", 0) == 0 and not state.get("is_human_feedback"):
+                # Multi-draft mode: write and critique all variants concurrently
+                state.update(await generate_best_draft(state, num_drafts))
+                
+                await manager.send_json_message({
+                    "type": "draft_created",
+                    "draft_post": state["draft_post"],
+                    "iteration": state["iteration_count"],
+                    "message": f"📝 Best of {num_drafts} drafts selected ({len(state['draft_post'])} characters)"
+                }, client_id)
+            else:
+                state.update(await copywriting_node(state))
+                
+                await manager.send_json_message({
+                    "type": "draft_created",
+                    "draft_post": state["draft_post"],
+                    "iteration": state["iteration_count"],
+                    "message": f"📝 Draft {'created' if state['iteration_count'] == 1 else 'refined'} ({len(state['draft_post'])} characters)"
+                }, client_id)
+                
+                # Critic phase
+                await manager.send_json_message({
+                    "type": "status",
+                    "status": "running",
+                    "progress": min(progress_base + 5, 90),
+                    "current_step": f"Analyzing draft (iteration {state['iteration_count']})",
+                    "message": "🔍 Analyzing draft for improvements..."
+                }, client_id)
+                
+                state.update(await critic_node(state))
             
             if not state["critiques"]:
                 await manager.send_json_message({
@@ -640,7 +885,7 @@ async def run_marketing_agent_async(request: str, max_iterations: int, client_id
             "message": "📄 Creating comprehensive report..."
         }, client_id)
         
-        report_path = generate_markdown_report(state)
+        report_path = await generate_markdown_report(state)
         if report_path:
             state["report_path"] = report_path
         
@@ -669,17 +914,15 @@ async def run_marketing_agent_async(request: str, max_iterations: int, client_id
 @app.get("/")
 async def root():
     """Serve the React frontend index.html"""
-    static_dir = os.path.join(os.path.dirname(__file__), "static")
-    index_file = os.path.join(static_dir, "index.html")
-    
-    if os.path.isfile(index_file):
-        return FileResponse(index_file)
+    if "index.html" in ROOT_FILES:
+        # index.html is not content-hashed, so browsers must revalidate it
+        return FileResponse(INDEX_FILE, headers=INDEX_HEADERS)
     else:
         return {"message": "Frontend not built. Please build the React app first.", "status": "running"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
 
 @app.post("/api/marketing/generate", response_model=MarketingResponse)
 async def generate_marketing_post(request: MarketingRequest):
@@ -687,18 +930,20 @@ async def generate_marketing_post(request: MarketingRequest):
     task_id = str(uuid.uuid4())
     
     # Store task info
-    active_tasks[task_id] = {
+    await task_store.save(task_id, {
         "id": task_id,
         "status": "pending",
         "progress": 0,
         "current_step": "Queued",
         "request": request.request,
         "max_iterations": request.max_iterations,
-        "created_at": datetime.now().isoformat(),
+        "num_drafts": request.num_drafts,
+        "no_cache": request.no_cache,
+        "created_at": datetime.now(timezone.utc),
         "result": None,
         "error": None,
         "state": None
-    }
+    })
     
     return MarketingResponse(
         success=True,
@@ -709,10 +954,10 @@ async def generate_marketing_post(request: MarketingRequest):
 @app.post("/api/marketing/{task_id}/human-feedback")
 async def submit_human_feedback(task_id: str, feedback: HumanFeedback):
     """Submit human feedback for a task awaiting approval"""
-    if task_id not in active_tasks:
+    task = await task_store.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = active_tasks[task_id]
     state = task.get("state")
     
     if not state:
@@ -726,18 +971,21 @@ async def submit_human_feedback(task_id: str, feedback: HumanFeedback):
         task["status"] = "completed"
         
         # Generate final report
-        report_path = generate_markdown_report(state)
+        report_path = await generate_markdown_report(state)
         if report_path:
             state["report_path"] = report_path
         
         task["result"] = state
+        await task_store.save(task_id, task)
         
         return {"message": "Post approved successfully", "status": "completed"}
         
     elif feedback.action == "reject":
         state["human_approved"] = False
         state["critiques"] = ["Human reviewer requested general improvements to the overall post quality and effectiveness."]
+        state["is_human_feedback"] = True
         state["iteration_count"] = 0  # Reset for new refinement cycle
+        await task_store.save(task_id, task)
         
         return {"message": "Post rejected - will continue refinement", "status": "continuing"}
         
@@ -747,7 +995,9 @@ async def submit_human_feedback(task_id: str, feedback: HumanFeedback):
             
         state["human_approved"] = False
         state["critiques"] = [f"Human feedback: {feedback.feedback}"]
+        state["is_human_feedback"] = True
         state["iteration_count"] = 0  # Reset for new refinement cycle
+        await task_store.save(task_id, task)
         
         return {"message": "Feedback received - will continue refinement", "status": "continuing"}
     
@@ -757,10 +1007,10 @@ async def submit_human_feedback(task_id: str, feedback: HumanFeedback):
 @app.get("/api/marketing/status/{task_id}", response_model=TaskStatus)
 async def get_task_status(task_id: str):
     """Get the status of a marketing post generation task"""
-    if task_id not in active_tasks:
+    task = await task_store.get(task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task = active_tasks[task_id]
     return TaskStatus(**{k: v for k, v in task.items() if k != "state"})
 
 @app.get("/api/marketing/examples")
@@ -776,93 +1026,208 @@ async def get_example_requests():
         ]
     }
 
+# Agent runs in flight on this worker, per WebSocket client: {client_id: {task_id: asyncio.Task}}
+agent_runs: Dict[str, Dict[str, asyncio.Task]] = {}
+
+def spawn_agent_run(client_id: str, task_id: str, coro) -> asyncio.Task:
+    """Runs an agent coroutine as a background task that is cancelled when the client disconnects."""
+    runs = agent_runs.setdefault(client_id, {})
+    previous = runs.get(task_id)
+    if previous is not None:
+        previous.cancel()
+    
+    run = asyncio.create_task(coro)
+    runs[task_id] = run
+    
+    def _forget(finished: asyncio.Task):
+        client_runs = agent_runs.get(client_id)
+        if client_runs is not None and client_runs.get(task_id) is finished:
+            del client_runs[task_id]
+            if not client_runs:
+                del agent_runs[client_id]
+    
+    run.add_done_callback(_forget)
+    return run
+
+# Generation jobs handed from WebSocket handlers to a fixed pool of agent workers
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "8"))
+AGENT_JOBS: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+async def enqueue_agent_run(client_id: str, task_id: str, coro):
+    """Queues an agent coroutine for the worker pool; waits only if the queue is full."""
+    await AGENT_JOBS.put((client_id, task_id, coro))
+
+async def agent_worker():
+    """Runs queued agent jobs one at a time, skipping jobs whose client has already gone."""
+    while True:
+        client_id, task_id, coro = await AGENT_JOBS.get()
+        try:
+            if client_id not in manager.active_connections:
+                coro.close()
+                task = await task_store.get(task_id)
+                if task is not None:
+                    await _mark_cancelled(task_id, task)  # Otherwise it stays "processing" until its TTL
+                continue
+            run = spawn_agent_run(client_id, task_id, coro)
+            try:
+                # asyncio.wait does not propagate the run's cancellation into the worker
+                await asyncio.wait({run})
+            except asyncio.CancelledError:
+                run.cancel()  # Worker shutdown must not leave the LLM calls running
+                raise
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Agent worker error for task {task_id}: {e}")
+        finally:
+            AGENT_JOBS.task_done()
+
+def cancel_agent_runs(client_id: str):
+    """Stops every agent run started by a client, aborting its in-flight OpenAI requests."""
+    for run in agent_runs.pop(client_id, {}).values():
+        run.cancel()
+
+async def _mark_cancelled(task_id: str, task: Dict[str, Any]):
+    task["status"] = "cancelled"
+    task["completed_at"] = datetime.now(timezone.utc)
+    await task_store.save(task_id, task)
+    print(f"🛑 Task {task_id} cancelled - client disconnected")
+
+async def _run_and_await_approval(task_id: str, task: Dict[str, Any], client_id: str,
+                                  resume_state: AgentState = None):
+    """
+    Runs the agent for a task - a new generation, or a refinement of resume_state after
+    human feedback - then hands the result over for human approval.
+    """
+    CURRENT_TASK.set((task_id, client_id))
+    
+    try:
+        # Refinements always run; new generations may reuse a recent identical one
+        cache_key = None
+        if resume_state is None and not task.get("no_cache", False):
+            cache_key = generation_cache_key(task["request"], task["max_iterations"], task.get("num_drafts", 1))
+        cached = GENERATION_CACHE.get(cache_key) if cache_key else None
+        
+        if cached is not None:
+            result = dict(cached)
+            await manager.send_json_message({
+                "type": "draft_created",
+                "draft_post": result["draft_post"],
+                "iteration": result["iteration_count"],
+                "message": "♻️ Reusing a recent draft for this identical request"
+            }, client_id)
+        else:
+            # Run the marketing agent
+            result = await run_marketing_agent_async(
+                task["request"],
+                task["max_iterations"],
+                client_id,
+                task.get("num_drafts", 1),
+                resume_state=resume_state
+            )
+            if cache_key:
+                GENERATION_CACHE[cache_key] = dict(result)
+        
+        # Store state for human approval
+        task["state"] = result
+        task["status"] = "awaiting_approval"
+        task["current_step"] = "Awaiting human approval"
+        task["completed_at"] = datetime.now(timezone.utc)
+        await task_store.save(task_id, task)
+        
+        # Send to human approval phase
+        await manager.send_json_message({
+            "type": "awaiting_human_approval",
+            "task_id": task_id,
+            "draft_post": result["draft_post"],
+            "research_findings": result["research_findings"],
+            "iteration_count": result["iteration_count"],
+            "critiques": result.get("critiques", [])
+        }, client_id)
+        
+    except asyncio.CancelledError:
+        await _mark_cancelled(task_id, task)
+        raise
+    except Exception as e:
+        task["status"] = "error"
+        task["error"] = str(e)
+        task["completed_at"] = datetime.now(timezone.utc)
+        await task_store.save(task_id, task)
+        
+        await manager.send_json_message({
+            "type": "generation_error",
+            "task_id": task_id,
+            "error": str(e)
+        }, client_id)
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    """WebSocket endpoint for real-time communication"""
-    await manager.connect(websocket, client_id)
+    """
+    WebSocket endpoint for real-time communication.
+    Connect with ?encoding=msgpack to exchange msgpack binary frames instead of JSON text.
+    """
+    await manager.connect(websocket, client_id, websocket.query_params.get("encoding") == "msgpack")
     
     try:
         while True:
             # Receive messages from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = await manager.receive_message(websocket, client_id)
+            except msgspec.DecodeError as e:
+                await manager.send_json_message({
+                    "type": "error",
+                    "message": f"Invalid message: {e}"
+                }, client_id)
+                continue
             
-            if message["type"] == "start_generation":
-                task_id = message["task_id"]
+            if isinstance(message, StartGenerationMessage):
+                task_id = message.task_id
                 
-                if task_id not in active_tasks:
+                task = await task_store.get(task_id)
+                if task is None:
                     await manager.send_json_message({
                         "type": "error",
                         "message": "Task not found"
                     }, client_id)
                     continue
                 
-                task = active_tasks[task_id]
                 
                 # Update task status
+                if message.no_cache:
+                    task["no_cache"] = True
                 task["status"] = "running"
                 task["progress"] = 0
                 task["current_step"] = "Starting"
+                await task_store.save(task_id, task)
                 
-                try:
-                    # Run the marketing agent
-                    result = await run_marketing_agent_async(
-                        task["request"],
-                        task["max_iterations"],
-                        client_id
-                    )
-                    
-                    # Store state for human approval
-                    task["state"] = result
-                    task["status"] = "awaiting_approval"
-                    task["current_step"] = "Awaiting human approval"
-                    task["completed_at"] = datetime.now().isoformat()
-                    
-                    # Send to human approval phase
-                    await manager.send_json_message({
-                        "type": "awaiting_human_approval",
-                        "task_id": task_id,
-                        "draft_post": result["draft_post"],
-                        "research_findings": result["research_findings"],
-                        "iteration_count": result["iteration_count"],
-                        "critiques": result.get("critiques", [])
-                    }, client_id)
-                    
-                except Exception as e:
-                    task["status"] = "error"
-                    task["error"] = str(e)
-                    task["completed_at"] = datetime.now().isoformat()
-                    
-                    await manager.send_json_message({
-                        "type": "generation_error",
-                        "task_id": task_id,
-                        "error": str(e)
-                    }, client_id)
+                # Hand the run to the worker pool so this loop keeps serving the socket
+                await enqueue_agent_run(client_id, task_id, _run_and_await_approval(task_id, task, client_id))
             
-            elif message["type"] == "human_feedback":
-                task_id = message["task_id"]
-                feedback_data = message["feedback"]
+            elif isinstance(message, HumanFeedbackMessage):
+                task_id = message.task_id
+                feedback_data = message.feedback
                 
-                if task_id not in active_tasks:
+                task = await task_store.get(task_id)
+                if task is None:
                     await manager.send_json_message({
                         "type": "error",
                         "message": "Task not found"
                     }, client_id)
                     continue
                 
-                task = active_tasks[task_id]
                 state = task.get("state")
                 
-                if feedback_data["action"] == "approve":
+                if feedback_data.action == "approve":
                     state["human_approved"] = True
                     task["status"] = "completed"
                     
                     # Generate final report
-                    report_path = generate_markdown_report(state)
+                    report_path = await generate_markdown_report(state)
                     if report_path:
                         state["report_path"] = report_path
                     
                     task["result"] = state
+                    await task_store.save(task_id, task)
                     
                     await manager.send_json_message({
                         "type": "generation_complete",
@@ -871,17 +1236,19 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                         "message": "🎉 Post approved! Process completed successfully."
                     }, client_id)
                 
-                elif feedback_data["action"] in ["reject", "feedback"]:
+                else:
                     # Continue refinement with feedback
                     state["human_approved"] = False
                     
-                    if feedback_data["action"] == "feedback" and feedback_data.get("feedback"):
-                        state["critiques"] = [f"Human feedback: {feedback_data['feedback']}"]
+                    if feedback_data.action == "feedback" and feedback_data.feedback:
+                        state["critiques"] = [f"Human feedback: {feedback_data.feedback}"]
                     else:
                         state["critiques"] = ["Human reviewer requested improvements."]
                     
+                    state["is_human_feedback"] = True
                     state["iteration_count"] = 0  # Reset iteration count
                     task["status"] = "running"
+                    await task_store.save(task_id, task)
                     
                     await manager.send_json_message({
                         "type": "status",
@@ -892,59 +1259,34 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                     }, client_id)
                     
                     # Continue the agent process
-                    try:
-                        result = await run_marketing_agent_async(
-                            task["request"],
-                            task["max_iterations"],
-                            client_id
-                        )
-                        
-                        task["state"] = result
-                        task["status"] = "awaiting_approval"
-                        
-                        await manager.send_json_message({
-                            "type": "awaiting_human_approval",
-                            "task_id": task_id,
-                            "draft_post": result["draft_post"],
-                            "research_findings": result["research_findings"],
-                            "iteration_count": result["iteration_count"],
-                            "critiques": result.get("critiques", [])
-                        }, client_id)
-                        
-                    except Exception as e:
-                        task["status"] = "error"
-                        task["error"] = str(e)
-                        
-                        await manager.send_json_message({
-                            "type": "generation_error",
-                            "task_id": task_id,
-                            "error": str(e)
-                        }, client_id)
+                    await enqueue_agent_run(
+                        client_id, task_id, _run_and_await_approval(task_id, task, client_id, resume_state=state)
+                    )
             
-            elif message["type"] == "ping":
+            elif isinstance(message, PingMessage):
                 await manager.send_json_message({
                     "type": "pong"
                 }, client_id)
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Whatever ends the loop (disconnect or an unexpected error), stop this client's runs
         manager.disconnect(client_id)
+        cancel_agent_runs(client_id)
 
 # Serve React frontend (catch-all route must be last)
 @app.get("/{full_path:path}")
 async def serve_frontend(full_path: str):
     """Serve React frontend for all non-API routes"""
-    static_dir = os.path.join(os.path.dirname(__file__), "static")
-    index_file = os.path.join(static_dir, "index.html")
-    
-    # If requesting a specific file that exists, serve it
-    if full_path and full_path != "":
-        file_path = os.path.join(static_dir, full_path)
-        if os.path.isfile(file_path):
-            return FileResponse(file_path)
+    # If requesting a top-level build file, serve it
+    file_path = ROOT_FILES.get(full_path)
+    if file_path is not None:
+        return FileResponse(file_path)
     
     # Otherwise serve index.html for React routing
-    if os.path.isfile(index_file):
-        return FileResponse(index_file)
+    if "index.html" in ROOT_FILES:
+        return FileResponse(INDEX_FILE, headers=INDEX_HEADERS)
     else:
         return {"message": "Frontend not built. Please build the React app first."}
 
@@ -954,10 +1296,21 @@ if __name__ == "__main__":
     print("🔌 WebSocket endpoint: ws://localhost:8000/ws/{client_id}")
     print("🌐 CORS enabled for: http://localhost:3000")
     
+    # Auto-reload is a development convenience; it cannot be combined with multiple workers
+    dev_mode = bool(os.getenv("DEV"))
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        reload=dev_mode,
+        workers=None if dev_mode else check_worker_count(int(os.getenv("WEB_CONCURRENCY", "1"))),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        ws="websockets",
+        ws_max_size=4 * 1024 * 1024,
+        ws_ping_interval=20,  # Protocol-level pings keep idle sockets alive during long LLM calls
+        ws_ping_timeout=20,
+        ws_per_message_deflate=True,
+        log_level="info" if dev_mode else "warning"
     )
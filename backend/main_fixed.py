@@ -94,6 +94,9 @@ def copywriting_node(state: AgentState) -> AgentState:
     )
     
     if iteration_count == 0:
+        key_points = "\n".join('• ' + point for point in research['key_points'])
+        competitor_insights = "\n".join('• ' + insight for insight in research['competitor_insights'])
+        success_criteria = "\n".join('• ' + criterion for criterion in research['success_criteria'])
         copywriter_prompt = f"""
         You are an expert marketing copywriter. Based on the research provided below, 
         create an engaging marketing post for the following request: "{initial_request}"
@@ -101,10 +104,10 @@ def copywriting_node(state: AgentState) -> AgentState:
         Research Findings:
         
         Key Points:
-        {chr(10).join('• ' + point for point in research['key_points'])}
+        {key_points}
         
         Competitor Insights:
-        {chr(10).join('• ' + insight for insight in research['competitor_insights'])}
+        {competitor_insights}
         
         Trending Hashtags: {', '.join(research['trending_hashtags'])}
         
@@ -113,7 +116,7 @@ def copywriting_node(state: AgentState) -> AgentState:
         Primary Platforms: {', '.join(research['audience_demographics']['platforms'])}
         
         Success Criteria:
-        {chr(10).join('• ' + criterion for criterion in research['success_criteria'])}
+        {success_criteria}
         
         Instructions for the marketing post:
         1. Create a compelling hook in the first line
@@ -130,6 +133,7 @@ def copywriting_node(state: AgentState) -> AgentState:
         current_draft = state["draft_post"]
         has_human_feedback = any("Human feedback:" in critique for critique in critiques)
         feedback_type = "HUMAN FEEDBACK" if has_human_feedback else "AI CRITIQUES"
+        critique_list = "\n".join('• ' + critique for critique in critiques)
         
         copywriter_prompt = f"""
         You are an expert marketing copywriter refining a marketing post. 
@@ -140,7 +144,7 @@ def copywriting_node(state: AgentState) -> AgentState:
         {current_draft}
         
         {feedback_type} TO ADDRESS:
-        {chr(10).join('• ' + critique for critique in critiques)}
+        {critique_list}
         
         RESEARCH CONTEXT:
         Key Points: {', '.join(research['key_points'])}
@@ -338,6 +342,9 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
     human_approved = state.get("human_approved", False)
     approval_attempts = state.get("approval_attempts", 0)
     
+    key_points = "\n".join('- ' + point for point in research.get('key_points', ['No key points available']))
+    outstanding_critiques = "\n".join('- ' + critique for critique in critiques) if critiques else "No outstanding critiques"
+    
     markdown_content = f"""# Marketing Agent Report
 
 ## 📋 Executive Summary
@@ -365,7 +372,7 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 ## 🔬 Research Findings
 
 ### Key Insights
-{chr(10).join('- ' + point for point in research.get('key_points', ['No key points available']))}
+{key_points}
 
 ### Target Audience Profile
 - **Age Range**: {research.get('audience_demographics', {}).get('age_range', 'Not specified')}
@@ -373,7 +380,7 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 - **Interests**: {', '.join(research.get('audience_demographics', {}).get('interests', ['Not specified']))}
 
 ### Outstanding Critiques
-{chr(10).join('- ' + critique for critique in critiques) if critiques else "No outstanding critiques"}
+{outstanding_critiques}
 
 ---
 
@@ -0,0 +1,84 @@
+"""
+Task storage for the LangGraph Marketing Agent backend.
+MemoryTaskStore keeps tasks in the current process; RedisTaskStore shares them
+between Gunicorn/Uvicorn workers so any worker can serve any task request.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from cachetools import TTLCache
+
+# Redis is optional - tasks stay in-process when it is not installed
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+# Finished tasks only need to live long enough for the client to fetch the result
+TERMINAL_STATUSES = frozenset({"completed", "error", "cancelled"})
+TERMINAL_TTL = 300
+
+class MemoryTaskStore:
+    """
+    Per-process task registry with bounded size (LRU eviction) and a time-to-live.
+    Tasks that reach a terminal status expire after TERMINAL_TTL seconds.
+    """
+
+    def __init__(self, max_tasks: int = 10000, ttl: int = 3600):
+        self._tasks: TTLCache = TTLCache(maxsize=max_tasks, ttl=ttl)
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._tasks.get(task_id)
+
+    async def save(self, task_id: str, task: Dict[str, Any]) -> None:
+        self._tasks[task_id] = task
+        if task.get("status") in TERMINAL_STATUSES:
+            asyncio.get_running_loop().call_later(TERMINAL_TTL, self._expire, task_id, task)
+
+    def _expire(self, task_id: str, task: Dict[str, Any]) -> None:
+        # Skip if the task was replaced or resumed since it finished
+        if self._tasks.get(task_id) is task and task.get("status") in TERMINAL_STATUSES:
+            self._tasks.pop(task_id, None)
+
+class RedisTaskStore:
+    """Task registry shared by all workers, stored as JSON under task:{task_id}."""
+
+    def __init__(self, url: str, ttl: int = 86400):
+        self._client = redis.from_url(url)
+        self._ttl = ttl
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(f"task:{task_id}")
+        return orjson.loads(raw) if raw is not None else None
+
+    async def save(self, task_id: str, task: Dict[str, Any]) -> None:
+        ttl = TERMINAL_TTL if task.get("status") in TERMINAL_STATUSES else self._ttl
+        await self._client.set(f"task:{task_id}", orjson.dumps(task), ex=ttl)
+
+def shared_store_available() -> bool:
+    """True when tasks will be kept in Redis, where every worker can see them."""
+    return bool(os.getenv("REDIS_URL")) and redis is not None
+
+def check_worker_count(workers: int) -> int:
+    """
+    Returns workers unchanged, or raises RuntimeError if it is more than one without a shared store.
+    In-process task storage would leave each worker blind to tasks started on the others.
+    """
+    if workers > 1 and not shared_store_available():
+        raise RuntimeError(
+            f"{workers} workers need a shared task store - set REDIS_URL and install redis, "
+            "or set WEB_CONCURRENCY=1"
+        )
+    return workers
+
+def create_task_store():
+    """Uses Redis when REDIS_URL is set (required with more than one worker), memory otherwise."""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        if redis is not None:
+            return RedisTaskStore(redis_url)
+        print("⚠️ REDIS_URL is set but redis is not installed - using in-process task storage")
+    return MemoryTaskStore()
@@ -38,6 +38,7 @@ interface WebSocketMessage {
   progress?: number;
   current_step?: string;
   message?: string;
+  delta?: string;
   research_findings?: ResearchFindings;
   draft_post?: string;
   iteration?: number;
@@ -78,6 +79,7 @@ const MarketingAgent: React.FC = () => {
   const [awaitingApproval, setAwaitingApproval] = useState(false);
   const [approvalData, setApprovalData] = useState<HumanApprovalData | null>(null);
   const [humanFeedback, setHumanFeedback] = useState('');
+  const [liveDraft, setLiveDraft] = useState('');
   
   const logOutputRef = useRef<HTMLDivElement>(null);
   const clientId = useRef(Math.random().toString(36).substr(2, 9));
@@ -181,7 +183,12 @@ const MarketingAgent: React.FC = () => {
         if (data.message) addLog('success', data.message);
         break;
         
+      case 'draft_token':
+        if (data.delta) setLiveDraft(prev => prev + data.delta);
+        break;
+        
       case 'draft_created':
+        setLiveDraft('');
         if (data.message) addLog('success', data.message);
         break;
         
@@ -316,6 +323,7 @@ const MarketingAgent: React.FC = () => {
     setAwaitingApproval(false);
     setApprovalData(null);
     setHumanFeedback('');
+    setLiveDraft('');
   };
 
   const handleHumanApproval = (action: 'approve' | 'reject' | 'feedback') => {
@@ -508,6 +516,16 @@ const MarketingAgent: React.FC = () => {
             )}
           </div>
 
+          {/* Draft being written (streamed token by token) */}
+          {liveDraft && (
+            <div className="result-display" style={{ marginTop: '20px' }}>
+              <h3>✍️ Writing Draft...</h3>
+              <div className="result-content" style={{ whiteSpace: 'pre-wrap' }}>
+                {liveDraft}
+              </div>
+            </div>
+          )}
+
           {/* Human Approval Interface */}
           {awaitingApproval && approvalData && (
             <div className="result-display" style={{ marginTop: '20px', borderLeft: '4px solid #ffc107' }}>
@@ -11,19 +11,110 @@ This module implements a marketing agent with self-correction capabilities:
 
 """
 
+import argparse
+import asyncio
+import json
+import logging
+import logging.handlers
 import os
-from typing import TypedDict, List, Dict, Any, Literal
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TypedDict, List, Dict, Any, Literal, Optional, Tuple
 from typing_extensions import Annotated
 from datetime import datetime
 
-from langchain_core.messages import HumanMessage, SystemMessage
+import httpx
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.cache.memory import InMemoryCache
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
+from langgraph.types import CachePolicy
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field, ValidationError
+
+from response_cache import create_response_cache
+
+# Line editing and history for the interactive prompts (not available on every platform)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    pass
 
-# Load environment variables
 from dotenv import load_dotenv
-load_dotenv()
+
+log = logging.getLogger("marketing_agent")
+
+@lru_cache(maxsize=1)
+def load_environment() -> None:
+    """Loads .env once, on first use, so importing this module stays free of disk access."""
+    load_dotenv()
+
+@lru_cache(maxsize=1)
+def get_response_cache():
+    """Cache of generated posts, so identical requests skip the copywriter LLM call."""
+    load_environment()
+    return create_response_cache()
+
+# Connection pool of the current run, shared by every model client so the copywriter and
+# critic (different models and temperatures) reuse the same keep-alive connections to OpenAI
+CURRENT_HTTP_CLIENT: ContextVar[Optional[httpx.AsyncClient]] = ContextVar("current_http_client", default=None)
+
+# Whether copywriting_node echoes the draft to stdout as it streams (off for library callers)
+ECHO_TOKENS: ContextVar[bool] = ContextVar("echo_tokens", default=False)
+
+# Whether copywriting_node skips the response cache lookup and always writes a fresh draft
+BYPASS_RESPONSE_CACHE: ContextVar[bool] = ContextVar("bypass_response_cache", default=False)
+
+@asynccontextmanager
+async def agent_session():
+    """
+    Opens the connections shared by one run on the current event loop and closes them afterwards.
+    
+    Every asyncio.run() starts a new event loop and pooled connections cannot outlive the
+    loop that opened them, so the HTTP pool and the Redis client live for one run only.
+    """
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        timeout=httpx.Timeout(60.0)  # Long completions routinely exceed httpx's 5 s default
+    ) as http_client:
+        token = CURRENT_HTTP_CLIENT.set(http_client)
+        try:
+            yield
+        finally:
+            CURRENT_HTTP_CLIENT.reset(token)
+            await get_response_cache().aclose()
+
+# The critic only scores and lists issues, which the smaller model handles at a fraction of the cost
+COPYWRITER_MODEL = "gpt-4o"
+CRITIC_MODEL = "gpt-4o-mini"
+COPYWRITER_TEMPERATURE = 0.7  # Creative drafting and refinement
+CRITIC_TEMPERATURE = 0.3  # Analytical scoring
+
+def get_llm(temperature: float, max_tokens: Optional[int] = None, model: str = COPYWRITER_MODEL) -> ChatOpenAI:
+    """
+    Returns a shared ChatOpenAI client for the given settings.
+    
+    Clients are shared within a run, which keeps its connection pool warm across nodes
+    and iterations. max_tokens caps the completion length, bounding decode time for short answers.
+    """
+    return _build_llm(temperature, max_tokens, model, CURRENT_HTTP_CLIENT.get())
+
+@lru_cache(maxsize=8)
+def _build_llm(temperature: float, max_tokens: Optional[int], model: str,
+               http_client: Optional[httpx.AsyncClient]) -> ChatOpenAI:
+    load_environment()
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        http_async_client=http_client
+    )
 
 class AgentState(TypedDict):
     """
@@ -32,23 +123,144 @@ class AgentState(TypedDict):
     Attributes:
         initial_request: The original user request for the marketing content
         research_findings: Research data gathered about the topic
+        research_context: Research findings rendered once for the LLM prompts
         draft_post: The generated marketing post draft
         critiques: List of critiques for improving the draft post
+        human_feedback: True when critiques come from the human reviewer rather than the AI critics
+        heuristic_critiques: Rule-based critiques of the first draft, merged into critiques
         iteration_count: Number of refinement iterations completed
         max_iterations: Maximum number of refinement iterations allowed
         human_approved: Boolean indicating if the post has been approved by a human
         approval_attempts: Number of times human approval has been requested
-        messages: Chat history for the conversation
+        messages: Copywriting conversation (prompt, drafts and feedback), replayed when refining
     """
     initial_request: str
     research_findings: Dict[str, Any]
+    research_context: str
     draft_post: str
     critiques: List[str]
+    human_feedback: bool
+    heuristic_critiques: List[str]
     iteration_count: int
     max_iterations: int
     human_approved: bool
     approval_attempts: int
-    messages: Annotated[List[HumanMessage], add_messages]
+    messages: Annotated[List[BaseMessage], add_messages]
+
+# Static prompt prefixes. They come first and stay byte-identical across calls so
+# OpenAI's automatic prompt caching can reuse them; per-call content goes last.
+COPYWRITER_SYSTEM_PROMPT = """You are an expert marketing copywriter focused on creating engaging, conversion-optimized content.
+You will receive research findings and a marketing request. When refining, you will also receive the current draft and the feedback to address.
+
+Instructions for a new marketing post:
+1. Create a compelling hook in the first line
+2. Include 2-3 key value propositions
+3. Use conversational yet professional tone
+4. Include a clear call-to-action
+5. Integrate 3-5 relevant hashtags naturally
+6. Keep it concise (under 300 words for social media)
+7. Make it platform-appropriate (professional for LinkedIn, engaging for Instagram)
+
+Instructions when refining a marketing post:
+Revise the post to address all the feedback while maintaining its strengths.
+Ensure the refined version:
+1. Addresses each specific point mentioned in the feedback (especially human feedback)
+2. Maintains the overall marketing effectiveness
+3. Stays true to the original request
+4. Follows best practices for the target platforms"""
+
+CRITIC_SYSTEM_PROMPT = """You are an expert marketing critic with years of experience in social media marketing, content strategy, and conversion optimization. Your job is to provide constructive, specific critiques of marketing content.
+
+You will receive research findings, the original request, a draft marketing post and one evaluation area. Evaluate the post on that area only.
+
+IMPORTANT INSTRUCTIONS:
+- If the post already meets this criterion, set "ready" to true and leave "critiques" empty
+- Otherwise, set "ready" to false and provide 1 specific, actionable critique for this area
+- Keep the critique short (40 words at most), clear and specific, and explain WHY it needs improvement
+- Be constructive, not just critical
+
+Respond with a JSON object with "ready" as its first key:
+{"ready": true, "critiques": []} OR {"ready": false, "critiques": ["..."]}"""
+
+CRITIQUE_AND_REFINE_SYSTEM_PROMPT = COPYWRITER_SYSTEM_PROMPT + """
+
+After refining, act as an expert marketing critic and review your refined post against these areas:
+Hook & Engagement, Value Proposition, Target Audience, Call-to-Action, Platform Optimization,
+Length & Readability, Hashtag Usage and Original Request Alignment.
+
+Return the refined post together with your critiques of it:
+- If the refined post is excellent and meets all criteria, return an empty critiques list
+- Otherwise, return 1-3 specific, actionable critiques that explain WHY each needs improvement"""
+
+# (prompt heading, priority note, log label) for the feedback being addressed, keyed on human_feedback
+FEEDBACK_LABELS = {
+    True: ("HUMAN FEEDBACK",
+           "This is direct feedback from a human reviewer. Please follow their specific instructions carefully and prioritize their requirements above all else.",
+           "human feedback"),
+    False: ("AI CRITIQUES",
+            "These are AI-generated critiques for improvement.",
+            "AI critiques")
+}
+
+class CritiqueResult(BaseModel):
+    """Structured critic verdict for one evaluation area."""
+    ready: bool = Field(description="True when the post needs no changes in this area")
+    critiques: List[str] = Field(default_factory=list, description="Specific, actionable critiques")
+
+class BatchPost(BaseModel):
+    """One generated post in a batched copywriting call."""
+    index: int = Field(description="Index of the request this post answers")
+    post: str = Field(description="The marketing post")
+
+class PostBatch(BaseModel):
+    """Structured result of a batched copywriting call."""
+    posts: List[BatchPost]
+
+class CritiqueRefine(BaseModel):
+    """Structured result of the fused refine + self-critique step."""
+    refined_post: str = Field(description="The revised marketing post")
+    critiques: List[str] = Field(default_factory=list, description="Critiques of the revised post; empty if it is ready")
+
+def render_research_context(research: Dict[str, Any]) -> str:
+    """
+    Renders the research findings shared by every copywriter and critic prompt.
+    
+    Keys are sorted so the block is byte-identical for identical research, which
+    keeps it inside the provider's cached prompt prefix.
+    """
+    return "RESEARCH FINDINGS:\n" + json.dumps(research, sort_keys=True, indent=2, ensure_ascii=False)
+
+# Mock research payload shared by every request; only the topic is filled in per call.
+# Inner sequences are tuples so the shared template cannot be mutated by accident.
+_MOCK_RESEARCH_TEMPLATE: Dict[str, Any] = {
+    "key_points": (
+        "Current market trends show high engagement with authentic content",
+        "Target audience prefers concise, value-driven messaging",
+        "Visual elements increase engagement by 40%",
+        "Best posting times are typically 9-11 AM and 2-4 PM"
+    ),
+    "competitor_insights": (
+        "Top competitors focus on storytelling approaches",
+        "User-generated content performs 50% better",
+        "Behind-the-scenes content drives authenticity"
+    ),
+    "trending_hashtags": (
+        "#marketing2024", "#digitalstrategy", "#contenttips", 
+        "#socialmedia", "#brandstory"
+    ),
+    "audience_demographics": {
+        "age_range": "25-45",
+        "interests": ("business", "entrepreneurship", "digital marketing"),
+        "platforms": ("LinkedIn", "Instagram", "Twitter")
+    },
+    "success_criteria": (
+        "Clear value proposition",
+        "Engaging hook",
+        "Strong call-to-action",
+        "Appropriate tone for target audience",
+        "Optimal length for platform"
+    )
+}
 
 def research_node(state: AgentState) -> AgentState:
     """
@@ -71,168 +283,146 @@ def research_node(state: AgentState) -> AgentState:
     # - Query knowledge databases
     # - Analyze competitor content
     # - Gather market insights
+    mock_research = {"topic": initial_request, **_MOCK_RESEARCH_TEMPLATE}
     
-    mock_research = {
-        "topic": initial_request,
-        "key_points": [
-            "Current market trends show high engagement with authentic content",
-            "Target audience prefers concise, value-driven messaging",
-            "Visual elements increase engagement by 40%",
-            "Best posting times are typically 9-11 AM and 2-4 PM"
-        ],
-        "competitor_insights": [
-            "Top competitors focus on storytelling approaches",
-            "User-generated content performs 50% better",
-            "Behind-the-scenes content drives authenticity"
-        ],
-        "trending_hashtags": [
-            "#marketing2024", "#digitalstrategy", "#contenttips", 
-            "#socialmedia", "#brandstory"
-        ],
-        "audience_demographics": {
-            "age_range": "25-45",
-            "interests": ["business", "entrepreneurship", "digital marketing"],
-            "platforms": ["LinkedIn", "Instagram", "Twitter"]
-        },
-        "success_criteria": [
-            "Clear value proposition",
-            "Engaging hook",
-            "Strong call-to-action",
-            "Appropriate tone for target audience",
-            "Optimal length for platform"
-        ]
-    }
-    
-    print(f"🔍 Research completed for: {initial_request}")
-    print(f"📊 Found {len(mock_research['key_points'])} key insights")
+    log.info("🔍 Research completed for: %s", initial_request)
+    log.info("📊 Found %d key insights", len(mock_research['key_points']))
     
     return {
-        **state,
-        "research_findings": mock_research
+        "research_findings": mock_research,
+        "research_context": render_research_context(mock_research)
     }
 
-def copywriting_node(state: AgentState) -> AgentState:
+async def copywriting_node(state: AgentState) -> AgentState:
     """
-    Copywriting node that creates or refines a marketing post.
+    Copywriting node that creates the first draft of the marketing post.
     
     This node takes the research data and generates a compelling marketing post
-    using an LLM. If critiques exist, it incorporates them for refinement.
+    using an LLM. Refinement happens in critique_and_refine_node.
     
     Args:
-        state: Current agent state with research findings and optional critiques
+        state: Current agent state with research findings
         
     Returns:
-        Updated state with the generated/refined draft post
+        Updated state with the generated draft post
     """
-    research = state["research_findings"]
     initial_request = state["initial_request"]
-    critiques = state.get("critiques", [])
-    iteration_count = state.get("iteration_count", 0)
     
-    # Initialize the language model
-    model = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.7,  # Slightly creative for marketing copy
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    # Shared language model - slightly creative for marketing copy
+    model = get_llm(COPYWRITER_TEMPERATURE)
     
-    # Create different prompts based on whether this is initial creation or refinement
-    if iteration_count == 0:
-        # Initial creation prompt
-        copywriter_prompt = f"""
-        You are an expert marketing copywriter. Based on the research provided below, 
-        create an engaging marketing post for the following request: "{initial_request}"
-        
-        Research Findings:
-        
-        Key Points:
-        {chr(10).join('• ' + point for point in research['key_points'])}
-        
-        Competitor Insights:
-        {chr(10).join('• ' + insight for insight in research['competitor_insights'])}
-        
-        Trending Hashtags: {', '.join(research['trending_hashtags'])}
-        
-        Target Audience: {research['audience_demographics']['age_range']} year-olds interested in {', '.join(research['audience_demographics']['interests'])}
-        
-        Primary Platforms: {', '.join(research['audience_demographics']['platforms'])}
-        
-        Success Criteria:
-        {chr(10).join('• ' + criterion for criterion in research['success_criteria'])}
-        
-        Instructions for the marketing post:
-        1. Create a compelling hook in the first line
-        2. Include 2-3 key value propositions
-        3. Use conversational yet professional tone
-        4. Include a clear call-to-action
-        5. Integrate 3-5 relevant hashtags naturally
-        6. Keep it concise (under 300 words for social media)
-        7. Make it platform-appropriate (professional for LinkedIn, engaging for Instagram)
-        
-        Generate the marketing post now:
-        """
-        print(f"✍️ Creating initial marketing post...")
-    else:
-        # Refinement prompt
-        current_draft = state["draft_post"]
-        
-        # Check if we have human feedback vs AI critiques
-        has_human_feedback = any("Human feedback:" in critique for critique in critiques)
-        feedback_type = "HUMAN FEEDBACK" if has_human_feedback else "AI CRITIQUES"
-        
-        copywriter_prompt = f"""
-        You are an expert marketing copywriter refining a marketing post. 
-        
-        ORIGINAL REQUEST: "{initial_request}"
-        
-        CURRENT DRAFT:
-        {current_draft}
-        
-        {feedback_type} TO ADDRESS:
-        {chr(10).join('• ' + critique for critique in critiques)}
-        
-        RESEARCH CONTEXT:
-        Key Points: {', '.join(research['key_points'])}
-        Success Criteria: {', '.join(research['success_criteria'])}
-        Target Audience: {research['audience_demographics']['age_range']} year-olds on {', '.join(research['audience_demographics']['platforms'])}
-        
-        IMPORTANT: {"This is direct feedback from a human reviewer. Please follow their specific instructions carefully and prioritize their requirements above all else." if has_human_feedback else "These are AI-generated critiques for improvement."}
-        
-        Please revise the marketing post to address all the feedback while maintaining its strengths. 
-        Ensure the refined version:
-        1. Addresses each specific point mentioned above {"(especially the human feedback)" if has_human_feedback else ""}
-        2. Maintains the overall marketing effectiveness
-        3. Stays true to the original request
-        4. Follows best practices for the target platforms
-        
-        Generate the refined marketing post:
-        """
-        feedback_source = "human feedback" if has_human_feedback else f"AI critiques"
-        print(f"🔄 Refining marketing post based on {feedback_source} (iteration {iteration_count + 1})...")
+    research_context = state["research_context"]
+    
+    copywriter_prompt = f"""Create an engaging marketing post for the following request: "{initial_request}"
+
+Generate the marketing post now:"""
+    log.info("✍️ Creating initial marketing post...")
     
     # Generate the marketing post
+    # The research block is its own message so it stays byte-identical across every call
     messages = [
-        SystemMessage(content="You are a skilled marketing copywriter focused on creating engaging, conversion-optimized content."),
+        SystemMessage(content=COPYWRITER_SYSTEM_PROMPT),
+        HumanMessage(content=research_context),
         HumanMessage(content=copywriter_prompt)
     ]
     
-    response = model.invoke(messages)
-    draft_post = response.content
+    # Key on everything the model sees, so a prompt or model change never serves a stale draft
+    response_cache = get_response_cache()
+    cache_key = response_cache.make_key(
+        model=COPYWRITER_MODEL,
+        temperature=COPYWRITER_TEMPERATURE,
+        messages=[[message.type, message.content] for message in messages]
+    )
+    draft_post = None if BYPASS_RESPONSE_CACHE.get() else await response_cache.get(cache_key)
     
-    print(f"📝 Post generated! Length: {len(draft_post)} characters")
+    if draft_post is not None:
+        log.info("♻️ Reusing cached marketing post for identical inputs")
+    else:
+        # Stream the draft so it shows up token by token instead of after the whole completion
+        echo = ECHO_TOKENS.get()
+        chunks = []
+        async with aclosing(model.astream(messages)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk.content)
+                if echo:
+                    print(chunk.content, end="", flush=True)
+        if echo:
+            print()
+        draft_post = "".join(chunks)
+        await response_cache.set(cache_key, draft_post)
+    
+    log.info("📝 Post generated! Length: %d characters", len(draft_post))
     
     return {
-        **state,
         "draft_post": draft_post,
-        "iteration_count": iteration_count + 1
+        "iteration_count": 1,
+        "messages": [*messages[1:], AIMessage(content=draft_post)]
     }
 
-def critic_node(state: AgentState) -> AgentState:
+# Evaluation areas reviewed by the critic, one concurrent LLM call each
+CRITIQUE_DIMENSIONS = [
+    ("Hook & Engagement", "Does it grab attention in the first line?"),
+    ("Value Proposition", "Are the benefits clear and compelling?"),
+    ("Target Audience", "Is the tone and content appropriate for the target demographic?"),
+    ("Call-to-Action", "Is there a clear, compelling CTA?"),
+    ("Platform Optimization", "Is it optimized for the intended social platforms?"),
+    ("Length & Readability", "Is it the right length and easy to read?"),
+    ("Hashtag Usage", "Are hashtags relevant and not excessive?"),
+    ("Original Request Alignment", "Does it fulfill the original request?")
+]
+
+# Maximum number of OpenAI requests in flight at once (keeps us under the OpenAI rate limits)
+DEFAULT_OPENAI_CONCURRENCY = "8"
+
+def openai_max_concurrency() -> int:
+    """Reads OPENAI_MAX_CONCURRENCY when a run starts, after .env has been loaded."""
+    load_environment()
+    return int(os.getenv("OPENAI_MAX_CONCURRENCY", DEFAULT_OPENAI_CONCURRENCY))
+
+# A verdict is one short critique at most; the cap stops verbose answers from running long
+CRITIC_MAX_TOKENS = 350
+
+# A streamed verdict is checked for "ready": true within its first characters, so a
+# passing area stops decoding immediately instead of waiting for the whole reply
+READY_PROBE_CHARS = 40
+READY_PATTERN = re.compile(r'"ready"\s*:\s*true')
+
+# Plain-text "nothing to fix" reply, matched case-insensitively without lowering the whole reply
+READY_MARKER_PATTERN = re.compile(r'no critiques\s*-\s*the post is ready', re.IGNORECASE)
+
+# A critique line in a plain-text critic reply: numbered ("1.", "10.") or bulleted
+CRITIQUE_LINE_PATTERN = re.compile(r'(?:\d+\.|[•\-*])')
+
+def parse_critique_text(critique_response: str) -> List[str]:
+    """
+    Fallback parser for critic replies that are not valid JSON.
+    
+    Args:
+        critique_response: Raw text returned by the critic model
+        
+    Returns:
+        List of critiques, one per numbered or bulleted line; empty if the post is ready
+    """
+    critique_response = critique_response.strip()
+    if READY_MARKER_PATTERN.match(critique_response):
+        return []
+    
+    critiques = [line for raw_line in critique_response.split('\n')
+                 if (line := raw_line.strip()) and CRITIQUE_LINE_PATTERN.match(line)]
+    
+    # If no numbered items found, treat the whole response as one critique
+    if not critiques and critique_response:
+        critiques = [critique_response]
+    
+    return critiques
+
+async def critic_node(state: AgentState) -> AgentState:
     """
     Critic node that analyzes the draft post and provides improvement suggestions.
     
     This node evaluates the draft against the original request and research findings,
-    producing a list of critiques for refinement.
+    producing a list of critiques for refinement. Each evaluation area is reviewed by
+    its own LLM call and all calls run concurrently.
     
     Args:
         state: Current agent state with draft post and research findings
@@ -242,98 +432,259 @@ def critic_node(state: AgentState) -> AgentState:
     """
     draft_post = state["draft_post"]
     initial_request = state["initial_request"]
-    research = state["research_findings"]
+    research_context = state["research_context"]
     iteration_count = state["iteration_count"]
     
-    # Initialize the language model
-    model = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.3,  # Lower temperature for more consistent critique
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    # Shared language model - lower temperature for more consistent critique.
+    # JSON mode keeps the verdict machine-readable while still letting us stream it
+    model = get_llm(CRITIC_TEMPERATURE, CRITIC_MAX_TOKENS, model=CRITIC_MODEL).bind(response_format={"type": "json_object"})
     
-    critic_prompt = f"""
-    You are an expert marketing critic with years of experience in social media marketing, 
-    content strategy, and conversion optimization. Your job is to provide constructive, 
-    specific critiques of marketing content.
+    semaphore = asyncio.Semaphore(openai_max_concurrency())
     
-    ORIGINAL REQUEST: "{initial_request}"
+    async def critique_dimension(area: str, question: str) -> List[str]:
+        # Everything up to the draft is shared by the concurrent area reviews
+        critic_prompt = f"""ORIGINAL REQUEST: "{initial_request}"
+
+DRAFT MARKETING POST TO CRITIQUE:
+{draft_post}
+
+EVALUATION AREA:
+**{area}**: {question}"""
+        
+        messages = [
+            SystemMessage(content=CRITIC_SYSTEM_PROMPT),
+            HumanMessage(content=research_context),
+            HumanMessage(content=critic_prompt)
+        ]
+        
+        chunks = []
+        head = ""
+        async with semaphore:
+            async with aclosing(model.astream(messages)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk.content)
+                    if len(head) < READY_PROBE_CHARS:
+                        head += chunk.content
+                        if READY_PATTERN.search(head):
+                            return []  # Closing the stream abandons the rest of the completion
+        
+        critique_response = "".join(chunks)
+        try:
+            result = CritiqueResult.model_validate_json(critique_response)
+        except ValidationError:
+            return parse_critique_text(critique_response)
+        return [] if result.ready else [critique.strip() for critique in result.critiques if critique.strip()]
     
-    DRAFT MARKETING POST TO CRITIQUE:
-    {draft_post}
+    # Review every evaluation area concurrently, keeping the areas in priority order
+    results = await asyncio.gather(*[critique_dimension(area, question) for area, question in CRITIQUE_DIMENSIONS])
+    critiques = [critique for dimension_critiques in results for critique in dimension_critiques]
     
-    RESEARCH CONTEXT:
-    Success Criteria: {', '.join(research['success_criteria'])}
-    Key Points: {', '.join(research['key_points'])}
-    Target Audience: {research['audience_demographics']['age_range']} year-olds interested in {', '.join(research['audience_demographics']['interests'])}
-    Primary Platforms: {', '.join(research['audience_demographics']['platforms'])}
-    Competitor Insights: {', '.join(research['competitor_insights'])}
+    log.info("🔍 Critique analysis completed (iteration %d)", iteration_count)
     
-    Please evaluate this marketing post and provide specific, actionable critiques. 
-    Focus on these key areas:
+    if not critiques:
+        log.info("✅ No critiques found - post is ready!")
+    else:
+        log.info("📝 Found %d critique(s):", len(critiques))
+        for i, critique in enumerate(critiques, 1):
+            log.info("   %d. %s", i, critique)
     
-    1. **Hook & Engagement**: Does it grab attention in the first line?
-    2. **Value Proposition**: Are the benefits clear and compelling?
-    3. **Target Audience**: Is the tone and content appropriate for the target demographic?
-    4. **Call-to-Action**: Is there a clear, compelling CTA?
-    5. **Platform Optimization**: Is it optimized for the intended social platforms?
-    6. **Length & Readability**: Is it the right length and easy to read?
-    7. **Hashtag Usage**: Are hashtags relevant and not excessive?
-    8. **Original Request Alignment**: Does it fulfill the original request?
+    return {
+        "critiques": critiques
+    }
+
+# Rule-based checks of the first draft, run locally alongside the LLM critic
+MAX_POST_WORDS = 300
+HASHTAG_RANGE = (3, 5)
+HASHTAG_PATTERN = re.compile(r"#\w+")
+CTA_KEYWORDS = ("learn more", "sign up", "join", "download", "try", "get", "visit",
+                "shop", "book", "order", "discover", "start", "click", "follow", "subscribe")
+# Whole words only, so "get" does not match "together"
+CTA_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in CTA_KEYWORDS) + r")\b", re.IGNORECASE)
+
+def critic_heuristic_node(state: AgentState) -> AgentState:
+    """
+    Rule-based critic that checks length, hashtag count and call-to-action without an LLM call.
     
-    IMPORTANT INSTRUCTIONS:
-    - If the post is already excellent and meets all criteria, respond with exactly: "No critiques - the post is ready."
-    - If there are issues, provide 1-3 specific, actionable critiques
-    - Each critique should be clear, specific, and explain WHY it needs improvement
-    - Focus on the most important issues first
-    - Be constructive, not just critical
+    Runs in parallel with critic_node; its critiques are merged into the LLM critiques
+    by merge_critiques_node.
     
-    Your response should be either "No critiques - the post is ready." OR a numbered list of specific critiques:
+    Args:
+        state: Current agent state with the draft post
+        
+    Returns:
+        Updated state with the heuristic critiques
     """
+    draft_post = state["draft_post"]
+    heuristic_critiques = []
+    
+    word_count = len(draft_post.split())
+    if word_count > MAX_POST_WORDS:
+        heuristic_critiques.append(f"The post is {word_count} words long; trim it to under {MAX_POST_WORDS} words so it reads well on social media")
+    
+    hashtag_count = len(HASHTAG_PATTERN.findall(draft_post))
+    if not HASHTAG_RANGE[0] <= hashtag_count <= HASHTAG_RANGE[1]:
+        heuristic_critiques.append(f"The post uses {hashtag_count} hashtag(s); use {HASHTAG_RANGE[0]}-{HASHTAG_RANGE[1]} relevant hashtags to reach the audience without looking spammy")
+    
+    if not CTA_PATTERN.search(draft_post):
+        heuristic_critiques.append("The post has no clear call-to-action; tell readers exactly what to do next")
+    
+    return {
+        "heuristic_critiques": heuristic_critiques
+    }
+
+def merge_critiques_node(state: AgentState) -> AgentState:
+    """
+    Fan-in node that appends the heuristic critiques to the LLM critiques.
+    
+    The rules are coarse, so they only add detail to a draft the LLM critic already
+    wants revised; when the LLM critic finds the post ready, they never force another loop.
+    
+    Args:
+        state: Current agent state after both critics have run
+        
+    Returns:
+        Updated state with the combined critiques
+    """
+    critiques = state.get("critiques", [])
+    heuristic_critiques = state.get("heuristic_critiques", [])
+    if not heuristic_critiques:
+        return {}
+    
+    if not critiques:
+        log.info("📏 LLM critic found the post ready - ignoring %d rule-based finding(s)", len(heuristic_critiques))
+        return {}
+    
+    log.info("📏 Rule-based checks added %d critique(s):", len(heuristic_critiques))
+    for i, critique in enumerate(heuristic_critiques, 1):
+        log.info("   %d. %s", i, critique)
+    
+    return {
+        "critiques": critiques + heuristic_critiques
+    }
+
+async def critique_and_refine_node(state: AgentState) -> AgentState:
+    """
+    Fused refinement node: revises the draft and critiques the revision in one LLM call.
+    
+    Replaces the copywriting -> critic round-trip pair inside the refinement loop,
+    halving the sequential LLM calls (and re-sent prompt tokens) per iteration.
+    The conversation so far is replayed and only the new feedback is appended, so the
+    research and request are not re-interpolated into every refinement prompt.
+    
+    Args:
+        state: Current agent state with the draft post and the critiques to address
+        
+    Returns:
+        Updated state with the refined draft post and its critiques
+    """
+    critiques = state.get("critiques", [])
+    iteration_count = state.get("iteration_count", 0)
+    
+    # Human feedback vs AI critiques is flagged by human_approval_node, no scan needed
+    feedback_type, feedback_note, feedback_source = FEEDBACK_LABELS[state.get("human_feedback", False)]
+    critique_list = "\n".join(["• " + critique for critique in critiques])
+    
+    refine_prompt = HumanMessage(content=f"""{feedback_type} TO ADDRESS:
+{critique_list}
+
+IMPORTANT: {feedback_note}
+
+Refine your latest marketing post, then critique your refined version:""")
     
     messages = [
-        SystemMessage(content="You are a marketing expert providing constructive critique to improve content quality."),
-        HumanMessage(content=critic_prompt)
+        SystemMessage(content=CRITIQUE_AND_REFINE_SYSTEM_PROMPT),
+        *state.get("messages", []),
+        refine_prompt
     ]
     
-    response = model.invoke(messages)
-    critique_response = response.content.strip()
+    log.info("🔄 Refining and re-critiquing marketing post based on %s (iteration %d)...", feedback_source, iteration_count + 1)
     
-    print(f"🔍 Critique analysis completed (iteration {iteration_count})")
+    model = get_llm(COPYWRITER_TEMPERATURE).with_structured_output(CritiqueRefine)
+    result = await model.ainvoke(messages)
     
-    # Parse the critiques
-    if "No critiques - the post is ready." in critique_response.lower():
-        critiques = []
-        print("✅ No critiques found - post is ready!")
+    new_critiques = [critique.strip() for critique in result.critiques if critique.strip()]
+    
+    log.info("📝 Post refined! Length: %d characters", len(result.refined_post))
+    if not new_critiques:
+        log.info("✅ No critiques found - post is ready!")
     else:
-        # Extract individual critiques (assuming they're numbered)
-        critique_lines = [line.strip() for line in critique_response.split('\n') if line.strip()]
-        critiques = []
-        
-        for line in critique_lines:
-            # Look for numbered items or bullet points
-            if any(line.startswith(prefix) for prefix in ['1.', '2.', '3.', '•', '-', '*']):
-                critiques.append(line)
-        
-        # If no numbered items found, treat the whole response as one critique
-        if not critiques and critique_response:
-            critiques = [critique_response]
-        
-        print(f"📝 Found {len(critiques)} critique(s):")
-        for i, critique in enumerate(critiques, 1):
-            print(f"   {i}. {critique}")
+        log.info("📝 Found %d critique(s):", len(new_critiques))
+        for i, critique in enumerate(new_critiques, 1):
+            log.info("   %d. %s", i, critique)
     
     return {
-        **state,
-        "critiques": critiques
+        "draft_post": result.refined_post,
+        "critiques": new_critiques,
+        "iteration_count": iteration_count + 1,
+        "human_feedback": False,
+        "messages": [refine_prompt, AIMessage(content=result.refined_post)]
     }
 
-def human_approval_node(state: AgentState) -> AgentState:
+# Reviewer answers accepted by human_approval_node
+APPROVAL_ACTIONS = {
+    "y": "approve", "yes": "approve",
+    "n": "reject", "no": "reject",
+    "f": "feedback", "feedback": "feedback"
+}
+
+def _read_piped_line(prompt: str) -> str:
+    """
+    input() for a non-terminal stdin, reading the file descriptor directly.
+    
+    sys.stdin's buffered reader holds a lock while it waits, which aborts interpreter
+    shutdown if the read is abandoned; one byte at a time also leaves later answers unread.
+    """
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    data = bytearray()
+    while not data.endswith(b"\n"):
+        byte = os.read(sys.stdin.fileno(), 1)
+        if not byte:
+            if not data:
+                raise EOFError("EOF when reading a line")
+            break
+        data += byte
+    return data.decode("utf-8", errors="replace").rstrip("\r\n")
+
+async def read_input(prompt: str) -> str:
+    """
+    Reads a line from stdin without blocking the event loop.
+    
+    The read runs on a daemon thread rather than the default executor, so a prompt left
+    waiting after Ctrl-C cannot hold up interpreter shutdown.
+    
+    Raises:
+        EOFError: If stdin is closed
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def deliver(setter, value) -> None:
+        if not future.done():
+            setter(value)
+    
+    def read() -> None:
+        try:
+            line = input(prompt) if sys.stdin.isatty() else _read_piped_line(prompt)
+        except BaseException as e:
+            callback = (deliver, future.set_exception, e)
+        else:
+            callback = (deliver, future.set_result, line)
+        try:
+            loop.call_soon_threadsafe(*callback)
+        except RuntimeError:
+            pass  # The loop already closed after the run was cancelled
+    
+    threading.Thread(target=read, name="approval-input", daemon=True).start()
+    return await future
+
+async def human_approval_node(state: AgentState) -> AgentState:
     """
     Human approval node that requests human review and approval of the draft post.
     
     This node presents the finalized draft post to a human reviewer and waits
-    for their approval or rejection decision.
+    for their approval or rejection decision. Input is read off the event loop; Ctrl-C
+    cancels the run, which main() reports as "not approved".
     
     Args:
         state: Current agent state with draft post ready for human review
@@ -362,38 +713,39 @@ def human_approval_node(state: AgentState) -> AgentState:
     # Human approval loop
     while True:
         try:
-            approval = input("\n👤 Do you approve this marketing post? [y/n/feedback]: ").strip().lower()
+            approval = (await read_input("\n👤 Do you approve this marketing post? [y/n/feedback]: ")).strip().lower()
             
-            if approval in ['y', 'yes']:
+            action = APPROVAL_ACTIONS.get(approval)
+            
+            if action == "approve":
                 print("✅ Post approved by human reviewer!")
                 return {
-                    **state,
                     "human_approved": True,
                     "approval_attempts": approval_attempts + 1
                 }
             
-            elif approval in ['n', 'no']:
+            elif action == "reject":
                 print("❌ Post rejected by human reviewer.")
                 print("🔄 Returning to critique & refine loop for improvements...")
                 return {
-                    **state,
                     "human_approved": False,
                     "approval_attempts": approval_attempts + 1,
                     "critiques": ["Human reviewer requested improvements to the overall post quality and effectiveness."],
+                    "human_feedback": True,
                     "iteration_count": 0  # Reset iteration count for new refinement cycle
                 }
             
-            elif approval in ['feedback', 'f']:
+            elif action == "feedback":
                 print("\n💬 Please provide specific feedback for improvement:")
-                human_feedback = input("Your feedback: ").strip()
+                human_feedback = (await read_input("Your feedback: ")).strip()
                 if human_feedback:
                     print(f"📝 Human feedback recorded: {human_feedback}")
                     print("🔄 Returning to critique & refine loop with human feedback...")
                     return {
-                        **state,
                         "human_approved": False,
                         "approval_attempts": approval_attempts + 1,
                         "critiques": [f"Human feedback: {human_feedback}"],
+                        "human_feedback": True,
                         "iteration_count": 0  # Reset iteration count for new refinement cycle
                     }
                 else:
@@ -402,27 +754,21 @@ def human_approval_node(state: AgentState) -> AgentState:
             else:
                 print("❌ Invalid input. Please enter 'y' for yes, 'n' for no, or 'feedback' for specific feedback.")
                 
-        except KeyboardInterrupt:
-            print("\n⚠️ Human approval interrupted. Treating as rejection.")
-            return {
-                **state,
-                "human_approved": False,
-                "approval_attempts": approval_attempts + 1,
-                "critiques": ["Human approval process was interrupted."],
-                "iteration_count": 0
-            }
+        except (asyncio.CancelledError, KeyboardInterrupt, EOFError):
+            # Ctrl-C cancels the whole run (and Ctrl-D ends input); the post stays unapproved
+            print("\n⚠️ Human approval interrupted. Post not approved.")
+            raise
         except Exception as e:
             print(f"❌ Error during human approval: {e}")
             print("Treating as rejection and continuing...")
             return {
-                **state,
                 "human_approved": False,
                 "approval_attempts": approval_attempts + 1,
                 "critiques": ["Error occurred during human approval process."],
                 "iteration_count": 0
             }
 
-def should_continue(state: AgentState) -> Literal["human_approval", "copywriting", "END"]:
+def should_continue(state: AgentState) -> Literal["human_approval", "critique_and_refine", "END"]:
     """
     Conditional edge function that determines the next step in the workflow.
     
@@ -431,43 +777,44 @@ def should_continue(state: AgentState) -> Literal["human_approval", "copywriting
         
     Returns:
         "human_approval" if no critiques and ready for human review
-        "copywriting" if refinement needed
+        "critique_and_refine" if refinement needed
         "END" if human approved or max attempts reached
     """
+    # If human has already approved, end the process
+    if state.get("human_approved", False):
+        log.info("🎉 Human approved - process complete!")
+        return "END"
+    
     critiques = state.get("critiques", [])
     iteration_count = state.get("iteration_count", 0)
     max_iterations = state.get("max_iterations", 3)
-    human_approved = state.get("human_approved", False)
-    approval_attempts = state.get("approval_attempts", 0)
-    
-    # If human has already approved, end the process
-    if human_approved:
-        print("🎉 Human approved - process complete!")
-        return "END"
     
     # If no critiques from critic_node, proceed to human approval
     if not critiques and iteration_count > 0:
-        print("✅ No AI critiques found - proceeding to human approval")
+        log.info("✅ No AI critiques found - proceeding to human approval")
         return "human_approval"
     
     # If there are critiques and we haven't reached max iterations, continue refining
     elif critiques and iteration_count < max_iterations:
-        print(f"🔄 Critiques found - continuing to refinement (iteration {iteration_count + 1})")
-        return "copywriting"
+        log.info("🔄 Critiques found - continuing to refinement (iteration %d)", iteration_count + 1)
+        return "critique_and_refine"
     
     # If we've reached max iterations, still go to human approval for final decision
     elif iteration_count >= max_iterations:
-        print(f"⚠️ Maximum iterations ({max_iterations}) reached - proceeding to human approval")
+        log.warning("⚠️ Maximum iterations (%d) reached - proceeding to human approval", max_iterations)
         return "human_approval"
     
     # Default fallback
     else:
         return "human_approval"
 
+@lru_cache(maxsize=1)
 def create_marketing_agent():
     """
     Creates and compiles the marketing agent StateGraph with critique & refine loop and human approval.
     
+    The compiled graph is immutable, so it is built once and shared by every run.
+    
     Returns:
         Compiled LangGraph agent ready for execution
     """
@@ -475,39 +822,50 @@ def create_marketing_agent():
     workflow = StateGraph(AgentState)
     
     # Add nodes to the graph
-    workflow.add_node("research", research_node)
+    # Research depends only on the request, so repeated requests reuse the cached findings
+    workflow.add_node(
+        "research",
+        research_node,
+        cache_policy=CachePolicy(ttl=3600, key_func=lambda state: state["initial_request"])
+    )
     workflow.add_node("copywriting", copywriting_node)
     workflow.add_node("critic", critic_node)
+    workflow.add_node("critic_heuristic", critic_heuristic_node)
+    workflow.add_node("merge_critiques", merge_critiques_node)
+    workflow.add_node("critique_and_refine", critique_and_refine_node)
     workflow.add_node("human_approval", human_approval_node)
     
     # Define the flow
     workflow.add_edge(START, "research")
     workflow.add_edge("research", "copywriting")
-    workflow.add_edge("copywriting", "critic")
     
-    # Add conditional edge from critic
-    workflow.add_conditional_edges(
-        "critic",
-        should_continue,
-        {
-            "copywriting": "copywriting",        # Loop back for refinement
-            "human_approval": "human_approval",  # Proceed to human review
-            "END": END                           # Finis if approved
-        }
-    )
+    # The LLM critic and the rule-based checks review the first draft in parallel
+    workflow.add_edge("copywriting", "critic")
+    workflow.add_edge("copywriting", "critic_heuristic")
+    workflow.add_edge(["critic", "critic_heuristic"], "merge_critiques")
+    
+    # Refinement loop: the first draft is reviewed by the critic, after which every
+    # iteration is a single fused refine + critique call
+    routes = {
+        "critique_and_refine": "critique_and_refine",  # Loop back for refinement
+        "human_approval": "human_approval",            # Proceed to human review
+        "END": END                                     # Finish if approved
+    }
+    workflow.add_conditional_edges("merge_critiques", should_continue, routes)
+    workflow.add_conditional_edges("critique_and_refine", should_continue, routes)
     
     # Add conditional edge from human approval
     workflow.add_conditional_edges(
         "human_approval",
-        lambda state: "END" if state.get("human_approved", False) else "copywriting",
+        lambda state: "END" if state.get("human_approved", False) else "critique_and_refine",
         {
-            "copywriting": "copywriting",  # Loop back if rejected
-            "END": END                    # Finish if approved
+            "critique_and_refine": "critique_and_refine",  # Loop back if rejected
+            "END": END                                     # Finish if approved
         }
     )
     
     # Compile the graph
-    app = workflow.compile()
+    app = workflow.compile(cache=InMemoryCache())
     
     return app
 
@@ -538,8 +896,28 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
     human_approved = state.get("human_approved", False)
     approval_attempts = state.get("approval_attempts", 0)
     
-    # Generate the markdown content
-    markdown_content = f"""# Marketing Agent Report
+    # Every list and conditional section is built once, up front
+    demographics = research.get('audience_demographics', {})
+    word_count = len(draft_post.split())
+    key_points = "\n".join('- ' + point for point in research.get('key_points', ['No key points available']))
+    competitor_insights = "\n".join('- ' + insight for insight in research.get('competitor_insights', ['No competitor insights available']))
+    success_criteria = "\n".join('- ' + criterion for criterion in research.get('success_criteria', ['No success criteria specified']))
+    final_critiques = "\n".join('- ' + critique for critique in critiques) if critiques else "No outstanding critiques"
+    
+    if human_approved:
+        next_steps = """✅ **Content Ready for Publication**
+- The marketing post has been approved by human reviewer
+- Content meets all quality standards
+- Ready for deployment across target platforms"""
+    else:
+        next_steps = """⏸️ **Action Required**
+- Human approval still needed
+- Consider addressing any outstanding critiques
+- Review content against success criteria"""
+    
+    # Generate the markdown content section by section
+    parts = [
+        f"""# Marketing Agent Report
 
 ## 📋 Executive Summary
 
@@ -551,31 +929,33 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 
 ---
 
-## 🔬 Research Findings
+""",
+        f"""## 🔬 Research Findings
 
 ### Topic Analysis
 **Subject**: {research.get('topic', 'Not specified')}
 
 ### Key Insights
-{chr(10).join('- ' + point for point in research.get('key_points', ['No key points available']))}
+{key_points}
 
 ### Target Audience Profile
-- **Age Range**: {research.get('audience_demographics', {}).get('age_range', 'Not specified')}
-- **Primary Platforms**: {', '.join(research.get('audience_demographics', {}).get('platforms', ['Not specified']))}
-- **Interests**: {', '.join(research.get('audience_demographics', {}).get('interests', ['Not specified']))}
+- **Age Range**: {demographics.get('age_range', 'Not specified')}
+- **Primary Platforms**: {', '.join(demographics.get('platforms', ['Not specified']))}
+- **Interests**: {', '.join(demographics.get('interests', ['Not specified']))}
 
 ### Competitor Insights
-{chr(10).join('- ' + insight for insight in research.get('competitor_insights', ['No competitor insights available']))}
+{competitor_insights}
 
 ### Trending Hashtags
 {', '.join(research.get('trending_hashtags', ['No hashtags identified']))}
 
 ### Success Criteria
-{chr(10).join('- ' + criterion for criterion in research.get('success_criteria', ['No success criteria specified']))}
+{success_criteria}
 
 ---
 
-## ✍️ Final Marketing Post
+""",
+        f"""## ✍️ Final Marketing Post
 
 ```
 {draft_post if draft_post else "No content generated"}
@@ -583,23 +963,25 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 
 ### Content Statistics
 - **Character Count**: {len(draft_post)}
-- **Word Count**: {len(draft_post.split())}
-- **Estimated Reading Time**: {max(1, len(draft_post.split()) // 200)} minute(s)
+- **Word Count**: {word_count}
+- **Estimated Reading Time**: {max(1, word_count // 200)} minute(s)
 
 ---
 
-## 🔄 Refinement Process
+""",
+        f"""## 🔄 Refinement Process
 
 ### Iteration Summary
 - **Total Iterations**: {iteration_count}
 - **Final Status**: {"Ready for publication" if human_approved else "Requires further refinement"}
 
 ### Final Critiques
-{chr(10).join('- ' + critique for critique in critiques) if critiques else "No outstanding critiques"}
+{final_critiques}
 
 ---
 
-## 👤 Human Review Process
+""",
+        f"""## 👤 Human Review Process
 
 ### Approval Status
 **Status**: {"✅ Approved by human reviewer" if human_approved else "❌ Pending human approval"}
@@ -607,7 +989,8 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 
 ---
 
-## 📊 Process Metrics
+""",
+        f"""## 📊 Process Metrics
 
 | Metric | Value |
 |--------|-------|
@@ -621,57 +1004,92 @@ def generate_markdown_report(state: Dict[str, Any], filename: str = None) -> str
 
 ---
 
-## 🚀 Next Steps
+""",
+        f"""## 🚀 Next Steps
 
-{"""✅ **Content Ready for Publication**
-- The marketing post has been approved by human reviewer
-- Content meets all quality standards
-- Ready for deployment across target platforms""" if human_approved else """⏸️ **Action Required**
-- Human approval still needed
-- Consider addressing any outstanding critiques
-- Review content against success criteria"""}
+{next_steps}
 
 ---
 
-## 🔧 Technical Details
+""",
+        f"""## 🔧 Technical Details
 
 **Agent Configuration**:
 - Max Iterations: {state.get('max_iterations', 'Not specified')}
-- AI Model: GPT-4o
-- Temperature Settings: Creative (0.7) / Analytical (0.3)
+- AI Models: {COPYWRITER_MODEL} (copywriter) / {CRITIC_MODEL} (critic)
+- Temperature Settings: Creative ({COPYWRITER_TEMPERATURE}) / Analytical ({CRITIC_TEMPERATURE})
 
 **Generated by**: LangGraph Marketing Agent
 """
+    ]
+    markdown_content = "".join(parts)
 
     # Write the markdown file
     try:
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(markdown_content)
         
-        print(f"📄 Marketing report generated: {filename}")
-        print(f"📁 File location: {filepath}")
+        log.info("📄 Marketing report generated: %s", filename)
+        log.info("📁 File location: %s", filepath)
         
         return filepath
         
     except Exception as e:
-        print(f"❌ Error generating markdown report: {e}")
+        log.error("❌ Error generating markdown report: %s", e)
         return None
 
-def run_marketing_agent(request: str, max_iterations: int = 3) -> Dict[str, Any]:
+# Reports are written on a background thread so callers don't wait on disk I/O
+_REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-writer")
+
+def collect_report(state: Dict[str, Any]) -> Optional[str]:
+    """
+    Waits for a report submitted to the background writer and records its path in the state.
+    
+    Args:
+        state: Final state returned by run_marketing_agent(wait_for_report=False)
+        
+    Returns:
+        Path to the generated markdown file, or None if it could not be written
+    """
+    report_future = state.pop("report_future", None)
+    if report_future is not None:
+        report_path = report_future.result()
+        if report_path:
+            state["report_path"] = report_path
+    return state.get("report_path")
+
+async def _invoke_agent(agent, initial_state: Dict[str, Any], echo_tokens: bool,
+                        use_cache: bool) -> Dict[str, Any]:
+    """Runs the compiled graph inside a session bound to the current event loop."""
+    ECHO_TOKENS.set(echo_tokens)
+    BYPASS_RESPONSE_CACHE.set(not use_cache)
+    async with agent_session():
+        return await agent.ainvoke(initial_state)
+
+def run_marketing_agent(request: str, max_iterations: int = 3, wait_for_report: bool = True,
+                        echo_tokens: bool = False, use_cache: bool = True) -> Dict[str, Any]:
     """
     Runs the marketing agent with critique & refine loop and human approval.
     
     Args:
         request: The initial marketing request from the user
         max_iterations: Maximum number of refinement iterations (default: 3)
+        wait_for_report: Wait for the markdown report to be written (default: True). When False,
+            the report is still being written on return; call collect_report(state) for its path
+        echo_tokens: Print the first draft to stdout as it streams in (default: False)
+        use_cache: Reuse a cached first draft for identical inputs (default: True). When False,
+            a fresh draft is always generated and replaces the cached one
         
     Returns:
         Dictionary containing the final state with research, critiques, approval status, and final post
     """
-    print(f"🚀 Starting marketing agent with critique & refine loop + human approval")
-    print(f"📝 Request: '{request}'")
-    print(f"🔄 Max iterations: {max_iterations}")
-    print(f"👤 Human approval: Required\n")
+    log.info("🚀 Starting marketing agent with critique & refine loop + human approval")
+    log.info("📝 Request: '%s'", request)
+    log.info("🔄 Max iterations: %d", max_iterations)
+    log.info("👤 Human approval: Required\n")
+    
+    # Load .env before the graph runs so LangSmith tracing sees its settings
+    load_environment()
     
     # Create the agent
     agent = create_marketing_agent()
@@ -680,42 +1098,171 @@ def run_marketing_agent(request: str, max_iterations: int = 3) -> Dict[str, Any]
     initial_state = {
         "initial_request": request,
         "research_findings": {},
+        "research_context": "",
         "draft_post": "",
         "critiques": [],
+        "human_feedback": False,
+        "heuristic_critiques": [],
         "iteration_count": 0,
         "max_iterations": max_iterations,
         "human_approved": False,
         "approval_attempts": 0,
-        "messages": [HumanMessage(content=request)]
+        "messages": []
     }
     
-    # Run the agent
-    final_state = agent.invoke(initial_state)
+    # Run the agent on the async runner so the nodes' LLM calls can overlap
+    final_state = asyncio.run(_invoke_agent(agent, initial_state, echo_tokens, use_cache))
     
     # Generate markdown report automatically
-    print("\n📄 Generating comprehensive report...")
-    report_path = generate_markdown_report(final_state)
-    if report_path:
-        final_state["report_path"] = report_path
+    log.info("\n📄 Generating comprehensive report...")
+    final_state["report_future"] = _REPORT_EXECUTOR.submit(generate_markdown_report, final_state)
+    if wait_for_report:
+        collect_report(final_state)
     
     return final_state
 
-def main():
+async def _write_post_batch(requests: List[str], offset: int) -> List[str]:
     """
-    Main function demonstrating the marketing agent with critique & refine loop.
+    Writes one marketing post per request in a single LLM call.
+    
+    Args:
+        requests: Marketing requests in this batch
+        offset: Index of the first request within the whole run (for logging)
+        
+    Returns:
+        Posts in the same order as the requests
+        
+    Raises:
+        ValueError: If the model left out the post for any request
+    """
+    numbered_requests = "\n".join([f"{i}. {request}" for i, request in enumerate(requests)])
+    batch_prompt = f"""{render_research_context(_MOCK_RESEARCH_TEMPLATE)}
+
+Create one engaging marketing post for each of the following {len(requests)} requests:
+{numbered_requests}
+
+Return every post with the index of the request it answers."""
+    
+    messages = [
+        SystemMessage(content=COPYWRITER_SYSTEM_PROMPT),
+        HumanMessage(content=batch_prompt)
+    ]
+    
+    log.info("✍️ Writing posts %d-%d in one call...", offset + 1, offset + len(requests))
+    result: PostBatch = await get_llm(COPYWRITER_TEMPERATURE).with_structured_output(PostBatch).ainvoke(messages)
+    
+    posts = {post.index: post.post for post in result.posts}
+    missing = [offset + i + 1 for i in range(len(requests)) if i not in posts]
+    if missing:
+        raise ValueError(f"The model returned no post for request(s) {missing}")
+    return [posts[i] for i in range(len(requests))]
+
+async def run_marketing_agent_batch(requests: List[str], batch_size: int = 5) -> List[Dict[str, Any]]:
+    """
+    Writes marketing posts for many requests, several requests per LLM call.
+    
+    Batching amortizes the per-call overhead and keeps a long request list under the
+    API's requests-per-minute limit. batch_size trades the two off: larger batches mean
+    fewer calls but slower ones. At most OPENAI_MAX_CONCURRENCY batch calls are in flight
+    at once. Batched posts skip the critique loop and human approval.
+    
+    Args:
+        requests: Marketing requests to write posts for
+        batch_size: Number of requests marshaled into one LLM call (default: 5)
+        
+    Returns:
+        One final state per request, in input order
+        
+    Raises:
+        ValueError: If the model left out the post for any request
+    """
+    log.info("🚀 Starting batched marketing agent for %d request(s), %d per call", len(requests), batch_size)
+    
+    load_environment()  # LangSmith reads its tracing settings when the first run starts
+    
+    batches = [requests[i:i + batch_size] for i in range(0, len(requests), batch_size)]
+    semaphore = asyncio.Semaphore(openai_max_concurrency())
+    
+    async def write_batch(batch: List[str], offset: int) -> List[str]:
+        async with semaphore:
+            return await _write_post_batch(batch, offset)
+    
+    async with agent_session():
+        batch_posts = await asyncio.gather(*[
+            write_batch(batch, i * batch_size) for i, batch in enumerate(batches)
+        ])
+    posts = [post for batch in batch_posts for post in batch]
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results = []
+    for i, (request, post) in enumerate(zip(requests, posts), 1):
+        research = {"topic": request, **_MOCK_RESEARCH_TEMPLATE}
+        final_state = {
+            "initial_request": request,
+            "research_findings": research,
+            "research_context": render_research_context(research),
+            "draft_post": post,
+            "critiques": [],
+            "human_feedback": False,
+            "heuristic_critiques": [],
+            "iteration_count": 1,
+            "max_iterations": 1,
+            "human_approved": False,
+            "approval_attempts": 0,
+            "messages": []
+        }
+        
+        final_state["report_future"] = _REPORT_EXECUTOR.submit(
+            generate_markdown_report, final_state, f"marketing_report_{timestamp}_{i}.md"
+        )
+        results.append(final_state)
+    
+    for final_state in results:
+        collect_report(final_state)
+    
+    return results
+
+# Banner and section underline for the result summary
+BANNER = "=" * 70
+SEP = "-" * 30
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parses command-line options from argv (sys.argv when None).
+    With no options given, main() falls back to the interactive menu.
+    """
+    parser = argparse.ArgumentParser(description="LangGraph marketing agent with critique & refine loop")
+    parser.add_argument("--request", help="Marketing request to write a post for")
+    parser.add_argument("--max-iter", type=int, default=3, choices=range(1, 6), metavar="{1-5}",
+                        help="Maximum refinement iterations (default: 3)")
+    parser.add_argument("--batch-file", help="File with one marketing request per line, written in batches")
+    parser.add_argument("--quiet", action="store_true", help="Skip progress logs and the result summary")
+    parser.add_argument("--no-cache", action="store_true", help="Always write a fresh draft instead of reusing a cached one")
+    return parser.parse_args(argv)
+
+# Example marketing requests offered by the interactive menu
+EXAMPLE_REQUESTS = [
+    "Create a marketing post for a new AI-powered productivity app",
+    "Generate content promoting a sustainable fashion brand",
+    "Write a post for a local coffee shop's grand opening"
+]
+
+# Valid menu answers mapped to their values; an empty answer (Enter) picks the default
+EXAMPLE_CHOICES = {"": EXAMPLE_REQUESTS[0], **{str(i): req for i, req in enumerate(EXAMPLE_REQUESTS, 1)}}
+MAX_ITERATION_CHOICES = {"": 3, **{str(i): i for i in range(1, 6)}}
+
+def prompt_for_request() -> Tuple[str, int]:
+    """
+    Interactive menu for choosing a marketing request and the iteration limit.
+    
+    Returns:
+        The chosen request and max iterations
     """
     print("=" * 80)
     print("🎯 LANGGRAPH MARKETING AGENT")
     print("=" * 80)
     print()
     
-    # Example marketing requests
-    example_requests = [
-        "Create a marketing post for a new AI-powered productivity app",
-        "Generate content promoting a sustainable fashion brand",
-        "Write a post for a local coffee shop's grand opening"
-    ]
-    
     print("📋 Choose an option:")
     print("   1. Use example requests")
     print("   2. Enter custom marketing request")
@@ -727,22 +1274,18 @@ def main():
         
         if choice == "1":
             print("\n📋 Example requests:")
-            for i, req in enumerate(example_requests, 1):
+            for i, req in enumerate(EXAMPLE_REQUESTS, 1):
                 print(f"   {i}. {req}")
             
             while True:
-                example_choice = input(f"\nSelect example (1-{len(example_requests)} or press Enter for 1): ").strip()
+                example_choice = input(f"\nSelect example (1-{len(EXAMPLE_REQUESTS)} or press Enter for 1): ").strip()
                 
-                if not example_choice:
-                    user_input = example_requests[0]
-                    print(f"✅ Using: {user_input}")
-                    break
-                elif example_choice.isdigit() and 1 <= int(example_choice) <= len(example_requests):
-                    user_input = example_requests[int(example_choice) - 1]
+                if example_choice in EXAMPLE_CHOICES:
+                    user_input = EXAMPLE_CHOICES[example_choice]
                     print(f"✅ Using: {user_input}")
                     break
                 else:
-                    print(f"❌ Invalid choice. Please enter 1-{len(example_requests)}")
+                    print(f"❌ Invalid choice. Please enter 1-{len(EXAMPLE_REQUESTS)}")
             break
             
         elif choice == "2":
@@ -760,67 +1303,159 @@ def main():
     # Get max iterations preference
     while True:
         max_iter_input = input(f"\n🔄 Max refinement iterations (1-5, press Enter for 3): ").strip()
-        if not max_iter_input:
-            max_iterations = 3
-            break
-        elif max_iter_input.isdigit() and 1 <= int(max_iter_input) <= 5:
-            max_iterations = int(max_iter_input)
+        if max_iter_input in MAX_ITERATION_CHOICES:
+            max_iterations = MAX_ITERATION_CHOICES[max_iter_input]
             break
         else:
             print("❌ Please enter a number between 1 and 5")
     
-    print(f"⚙️ Using {max_iterations} max iterations")
-    print("👤 Human approval will be required for final review")
-    print("\n" + "=" * 80)
+    return user_input, max_iterations
+
+def configure_logging(buffered: bool = False, level: int = logging.INFO) -> None:
+    """
+    Sends progress logs to stdout as plain messages.
     
-    try:
-        # Run the agent
-        result = run_marketing_agent(user_input, max_iterations)
-        
-        # Display results
-        print("\n" + "=" * 70)
-        print("📋 FINAL RESULTS")
-        print("=" * 70)
-        
-        print(f"\n� REFINEMENT SUMMARY:")
-        print("-" * 35)
-        print(f"Total iterations completed: {result['iteration_count']}")
-        print(f"Final critiques: {len(result.get('critiques', []))}")
-        
-        if result.get('critiques'):
-            print("\nFinal critiques that couldn't be resolved:")
-            for i, critique in enumerate(result['critiques'], 1):
-                print(f"  {i}. {critique}")
+    Args:
+        buffered: Hold records in memory and write them in blocks (for batch runs),
+            instead of writing and flushing stdout on every line
+        level: Lowest level written (logging.WARNING hides progress messages)
+    """
+    handler: logging.Handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    if buffered:
+        handler = logging.handlers.MemoryHandler(capacity=200, flushLevel=logging.ERROR, target=handler)
+    
+    # Only the agent's own logger is configured; the root logger is left alone so
+    # httpx/openai don't print a line for every API call
+    log.handlers = [handler]
+    log.setLevel(level)
+    log.propagate = False
+
+def print_summary(result: Dict[str, Any]) -> None:
+    """
+    Prints the final results of a run: refinement summary, research, post and report location.
+    
+    Args:
+        result: Final state returned by run_marketing_agent(wait_for_report=False)
+    """
+    # Lines are collected into one buffer and written with a single call.
+    # Degraded runs may return partial state; show what is there rather than raising KeyError
+    research = result.get("research_findings") or {}
+    key_points = research.get("key_points", ())
+    critiques = result.get('critiques', [])
+    out = [
+        "\n" + BANNER,
+        "📋 FINAL RESULTS",
+        BANNER,
+        f"\n� REFINEMENT SUMMARY:",
+        "-" * 35,
+        f"Total iterations completed: {result.get('iteration_count', 0)}",
+        f"Final critiques: {len(critiques)}"
+    ]
+    
+    if critiques:
+        out.append("\nFinal critiques that couldn't be resolved:")
+        out.extend(f"  {i}. {critique}" for i, critique in enumerate(critiques, 1))
+    
+    out.extend([
+        f"\n🔍 RESEARCH FINDINGS:",
+        SEP,
+        f"Topic: {research.get('topic', 'Not specified')}",
+        f"\nKey Points ({len(key_points)}):"
+    ])
+    out.extend(f"  • {point}" for point in key_points)
+    
+    out.extend([
+        f"\n✍️ FINAL MARKETING POST:",
+        SEP,
+        result.get("draft_post") or "(no draft produced)"
+    ])
+    
+    # The report was written in the background while the results were formatted
+    report_path = collect_report(result)
+    
+    # Show report information
+    if report_path:
+        report_name = os.path.basename(report_path)
+        out.extend([
+            f"\n📄 COMPREHENSIVE REPORT:",
+            SEP,
+            f"Report generated: {report_name}",
+            f"Location: {report_path}",
+            "This report contains detailed analysis, metrics, and the complete process history."
+        ])
+    
+    out.extend([
+        "\n" + BANNER,
+        "✅ Marketing agent with critique & refine loop completed!"
+    ])
+    if report_path:
+        out.append(f"📄 Comprehensive report saved as: {report_name}")
+    out.append(BANNER)
+    
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.stdout.flush()
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Main function demonstrating the marketing agent with critique & refine loop.
+    
+    Args:
+        argv: Command-line arguments to use instead of sys.argv, e.g. ["--request", "...", "--quiet"]
         
-        print(f"\n🔍 RESEARCH FINDINGS:")
-        print("-" * 30)
-        research = result["research_findings"]
-        print(f"Topic: {research['topic']}")
-        print(f"\nKey Points ({len(research['key_points'])}):")
-        for point in research["key_points"]:
-            print(f"  • {point}")
+    Returns:
+        The final state (a list of them for --batch-file), or None if the run failed
+    """
+    args = parse_args(argv)
+    load_environment()  # .env may hold the LANGCHAIN_* tracing settings as well as the API key
+    configure_logging(buffered=bool(args.batch_file), level=logging.WARNING if args.quiet else logging.INFO)
+    
+    if args.batch_file:
+        with open(args.batch_file, encoding="utf-8") as f:
+            requests = [line.strip() for line in f if line.strip()]
         
-        print(f"\n✍️ FINAL MARKETING POST:")
-        print("-" * 30)
-        print(result["draft_post"])
+        results = asyncio.run(run_marketing_agent_batch(requests))
+        if not args.quiet:
+            for handler in log.handlers:
+                handler.flush()  # Write the buffered progress logs ahead of the posts
+            for result in results:
+                print(f"\n📝 {result['initial_request']}")
+                print(SEP)
+                print(result["draft_post"])
+        return results
+    
+    if args.request:
+        user_input, max_iterations = args.request, args.max_iter
+    else:
+        user_input, max_iterations = prompt_for_request()
+    
+    if not args.quiet:
+        print(f"⚙️ Using {max_iterations} max iterations")
+        print("👤 Human approval will be required for final review")
+        print("\n" + "=" * 80)
+    
+    try:
+        # Run the agent
+        result = run_marketing_agent(user_input, max_iterations, wait_for_report=False,
+                                     echo_tokens=not args.quiet, use_cache=not args.no_cache)
         
-        # Show report information
-        if "report_path" in result:
-            print(f"\n📄 COMPREHENSIVE REPORT:")
-            print("-" * 30)
-            print(f"Report generated: {os.path.basename(result['report_path'])}")
-            print(f"Location: {result['report_path']}")
-            print("This report contains detailed analysis, metrics, and the complete process history.")
+        if args.quiet:
+            collect_report(result)
+        else:
+            print_summary(result)
         
-        print("\n" + "=" * 70)
-        print("✅ Marketing agent with critique & refine loop completed!")
-        if "report_path" in result:
-            print(f"📄 Comprehensive report saved as: {os.path.basename(result['report_path'])}")
-        print("=" * 70)
+        return result
         
+    except (KeyboardInterrupt, EOFError):
+        # Ctrl-C during the run (or stdin closing at the approval prompt)
+        sys.stderr.write("\n⚠️ Run interrupted - the post was not approved.\n")
+        return None
     except Exception as e:
-        print(f"\n❌ Error running marketing agent: {str(e)}")
-        print("Please check your OpenAI API key in the .env file")
+        sys.stderr.write("".join([
+            f"\n❌ Error running marketing agent: {e}\n",
+            "Please check your OpenAI API key in the .env file\n"
+        ]))
+        return None
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() is not None else 1)
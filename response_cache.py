@@ -0,0 +1,85 @@
+"""
+Response cache for the LangGraph Marketing Agent CLI.
+
+Copywriting results are stored under a SHA-256 hash of the inputs that determine
+them, so repeating an identical request skips the OpenAI round-trip. Redis is used
+when REDIS_URL is set and redis-py is installed; otherwise entries live in a
+bounded in-memory TTL cache, like the backend's llm_cache.MemoryCache.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+try:  # Optional: only needed when REDIS_URL is set
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+class ResponseCache:
+    """
+    Exact-match cache for generated marketing posts.
+    
+    Attributes:
+        ttl: Seconds an entry stays valid
+        prefix: Namespace for the cache keys
+    
+    The in-memory store keeps at most maxsize entries, evicting the least recently used.
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = 3600, prefix: str = "mkt:draft:",
+                 maxsize: int = 256):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis_url = redis_url if redis is not None else None
+        self._redis = None
+        self._memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+    
+    def make_key(self, **inputs: Any) -> str:
+        """
+        Hashes the generation inputs into a cache key.
+        
+        Args:
+            **inputs: JSON-serializable values that determine the response
+            
+        Returns:
+            Namespaced cache key
+        """
+        payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+        return self.prefix + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _client(self):
+        """Returns the Redis client, opened on the current event loop, or None when Redis is not used."""
+        if self._redis is None and self._redis_url:
+            self._redis = redis.from_url(self._redis_url)
+        return self._redis
+    
+    async def aclose(self) -> None:
+        """Closes the Redis connections; the next call reopens them on the then-running event loop."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for key, or None on a miss."""
+        client = self._client()
+        if client is not None:
+            value = await client.get(key)
+            return value.decode("utf-8") if value is not None else None
+        
+        return self._memory.get(key)
+    
+    async def set(self, key: str, value: str) -> None:
+        """Stores value under key for ttl seconds."""
+        client = self._client()
+        if client is not None:
+            await client.set(key, value, ex=self.ttl)
+        else:
+            self._memory[key] = value
+
+def create_response_cache() -> ResponseCache:
+    """Creates the cache, backed by Redis when REDIS_URL is set."""
+    return ResponseCache(redis_url=os.getenv("REDIS_URL"))